@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import Position
+from engine import Engine, DIFFICULTIES
+from pdn import board_move_text
+
+# Offline position analysis. Positions are read one per line, as PDN FEN
+# strings (see Position.from_fen), from a file or standard input, searched in
+# worker processes and written as JSON lines in input order: best move,
+# score, principal variation (in PDN) and the search statistics. Blank lines
+# and lines starting with # are skipped.
+#
+# Input is read only as fast as results are written, so at most --queue
+# positions are in flight and memory stays flat for inputs of any length.
+
+_engine = None  # Each worker process searches with its own engine
+
+
+def _start_worker(difficulty, options):
+    global _engine
+    _engine = Engine(difficulty, **options)
+
+
+def analyze(line_number, fen):
+    """Search one position with this process's engine and return its result record"""
+    record = {'line': line_number, 'fen': fen}
+    try:
+        position = Position.from_fen(fen)
+    except ValueError as error:
+        record['error'] = str(error)
+        return record
+
+    # Fresh tables and move ordering history, so a result does not depend on
+    # which positions the worker saw before
+    _engine.reset()
+    _engine.orderer.history.clear()
+    board = position.to_board()
+    result = _engine.search(board, position.turn)
+    pv = []
+    records = []
+    for move in result.pv:
+        pv.append(board_move_text(board, move))
+        records.append(board.apply_move(*move))
+    for move_record in reversed(records):
+        board.undo_move(move_record)
+    record.update({
+        'turn': position.turn,
+        'winner': position.winner(),
+        'move': board_move_text(board, result.move) if result.move else None,
+        'score': result.score,  # From the side to move's point of view
+        'depth': result.depth,
+        'pv': pv,
+        'stats': result.stats.to_dict(),
+    })
+    return record
+
+
+def read_positions(lines):
+    for line_number, line in enumerate(lines, 1):
+        fen = line.strip()
+        if fen and not fen.startswith('#'):
+            yield line_number, fen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze positions given as one FEN per line")
+    parser.add_argument('input', nargs='?', default='-', help="file of FEN lines (default: standard input)")
+    parser.add_argument('--output', default='-', help="JSON lines output (default: standard output)")
+    parser.add_argument('--difficulty', default='very_hard', choices=DIFFICULTIES)
+    parser.add_argument('--time', type=float, default=None,
+                        help="seconds per position (default: 1, or no limit with --depth or --nodes)")
+    parser.add_argument('--depth', type=int, default=None, help="deepest iteration per position")
+    parser.add_argument('--nodes', type=int, default=None, help="node budget per position")
+    parser.add_argument('--tt', type=int, default=16, help="transposition table MB per worker")
+    parser.add_argument('--tb', default=None, help="endgame tablebase file")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--queue', type=int, default=None, help="most positions in flight (default: 4 per worker)")
+    args = parser.parse_args()
+
+    options = {'tt_size_mb': args.tt, 'tablebase': args.tb, 'node_budget': args.nodes,
+               'time_budget': args.time if args.time or args.depth or args.nodes else 1.0}
+    if args.depth:
+        options['max_depth'] = args.depth
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    count = 0
+    start = time.perf_counter()
+
+    def write(record):
+        nonlocal count
+        count += 1
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+
+    try:
+        if args.workers == 1:
+            _start_worker(args.difficulty, options)
+            try:
+                for line_number, fen in read_positions(source):
+                    write(analyze(line_number, fen))
+            finally:
+                _engine.close()
+        else:
+            with ProcessPoolExecutor(args.workers, initializer=_start_worker,
+                                     initargs=(args.difficulty, options)) as pool:
+                # Results are written in submission order, which is input order
+                limit = args.queue or 4 * (args.workers or os.cpu_count() or 1)
+                pending = deque()
+                for line_number, fen in read_positions(source):
+                    pending.append(pool.submit(analyze, line_number, fen))
+                    if len(pending) >= limit:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.1f}/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
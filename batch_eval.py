@@ -0,0 +1,113 @@
+from bitboard import SQUARES, STEPS, JUMPS, WHITE_DIRS, RED_DIRS, square_coords
+from constants import WHITE, RED
+from evaluation import PIECE_SQUARE, DEFENSIVE, COMPREHENSIVE
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the scalar evaluators cover every difficulty
+    np = None
+
+# Batch leaf evaluation with NumPy. Positions are stacked as an N x 32 int8
+# array over the dark squares in bitboard order: 1/2 for a white man/king,
+# -1/-2 for a red man/king and 0 for an empty square. The features and the
+# weighted sums of evaluate_simple, evaluate_defensive and
+# evaluate_comprehensive are computed for all N positions at once and match
+# the scalar evaluators.
+
+# evaluate_batch covers easy, hard and very_hard, but the search only batches
+# where it pays: easy and hard read running totals kept by the board, which
+# no batch beats, and very_hard's evaluator only loses from about
+# BATCH_CROSSOVER positions per call (benchmark.py batch-eval)
+BATCH_DIFFICULTIES = ('very_hard',)
+BATCH_CROSSOVER = 24
+
+SQUARE_COORDS = [square_coords(sq) for sq in range(SQUARES)]
+OFF_BOARD = 100  # Value of the padding column that neighbour lookups hit off the board
+
+
+def available():
+    return np is not None
+
+
+def encode(board):
+    """A Board as 32 small ints in bitboard square order"""
+    grid = board.board
+    codes = []
+    for row, col in SQUARE_COORDS:
+        piece = grid[row][col].piece
+        if piece is None:
+            codes.append(0)
+        else:
+            code = 2 if piece.king else 1
+            codes.append(code if piece.color == WHITE else -code)
+    return codes
+
+
+def _build_tables():
+    off = SQUARES  # Index of the padding column
+    steps = np.array([[STEPS[sq][d] if STEPS[sq][d] >= 0 else off for sq in range(SQUARES)] for d in range(4)])
+    over = np.array([[JUMPS[sq][d][0] if JUMPS[sq][d] else off for sq in range(SQUARES)] for d in range(4)])
+    land = np.array([[JUMPS[sq][d][1] if JUMPS[sq][d] else off for sq in range(SQUARES)] for d in range(4)])
+
+    # Piece-square values indexed by [code + 2, square]
+    pst = np.zeros((2, 5, SQUARES))
+    for code in (-2, -1, 1, 2):
+        color = WHITE if code > 0 else RED
+        for sq, (row, col) in enumerate(SQUARE_COORDS):
+            values = PIECE_SQUARE[(color, abs(code) == 2)][row][col]
+            pst[DEFENSIVE, code + 2, sq] = values[DEFENSIVE]
+            pst[COMPREHENSIVE, code + 2, sq] = values[COMPREHENSIVE]
+    return steps, over, land, pst
+
+
+if np is not None:
+    STEP_INDEX, OVER_INDEX, LAND_INDEX, PST = _build_tables()
+
+
+def evaluate_batch(encoded, difficulty):
+    """Scores from WHITE's point of view for every row of encoded"""
+    if np is None:
+        raise ImportError("batch evaluation needs numpy")
+    enc = np.asarray(encoded, dtype=np.int8)
+    if enc.ndim == 1:
+        enc = enc.reshape(1, -1)
+
+    if difficulty == 'easy':
+        white_left = (enc > 0).sum(axis=1)
+        red_left = (enc < 0).sum(axis=1)
+        white_kings = (enc == 2).sum(axis=1)
+        red_kings = (enc == -2).sum(axis=1)
+        return (white_left - red_left) + (white_kings * 1.5 - red_kings * 1.5)
+
+    squares = np.arange(SQUARES)
+    index = enc.astype(np.intp) + 2
+    if difficulty == 'hard':
+        return PST[DEFENSIVE][index, squares].sum(axis=1)
+    if difficulty != 'very_hard':
+        raise ValueError(f"no batch evaluator for difficulty {difficulty!r}")
+
+    score = PST[COMPREHENSIVE][index, squares].sum(axis=1)
+    padded = np.concatenate([enc, np.full((len(enc), 1), OFF_BOARD, dtype=np.int8)], axis=1)
+    white = enc > 0
+    red = enc < 0
+    kings = (enc == 2) | (enc == -2)
+    vulnerable = np.zeros(enc.shape, dtype=bool)
+    protected = np.zeros(enc.shape, dtype=bool)
+    for d in range(4):
+        # Pieces that move in direction d
+        moves = kings | (white & (d in WHITE_DIRS)) | (red & (d in RED_DIRS))
+
+        # AttackMap.capturers: an opponent one step away and an empty square beyond it
+        over = padded[:, OVER_INDEX[d]]
+        land = padded[:, LAND_INDEX[d]]
+        opponent = np.where(white, over < 0, (over > 0) & (over != OFF_BOARD))
+        vulnerable |= moves & opponent & (land == 0)
+
+        # AttackMap.protected: a friend on the opposite diagonal, or an empty square to move to
+        ahead = padded[:, STEP_INDEX[d]]
+        behind = padded[:, STEP_INDEX[3 - d]]
+        friend = np.where(white, (behind > 0) & (behind != OFF_BOARD), behind < 0)
+        protected |= moves & (friend | (ahead == 0))
+
+    piece_values = 3 * protected.astype(np.int8) - 3 * vulnerable.astype(np.int8)
+    return score + (piece_values * np.sign(enc)).sum(axis=1)
@@ -0,0 +1,161 @@
+import argparse
+import random
+import time
+
+from bitboard import Position
+from constants import RED, WHITE
+from engine import Engine
+from batch_eval import encode, evaluate_batch
+
+
+def sample_positions(count, seed=0, plies=(5, 15)):
+    """Start-of-game positions with WHITE to move, reached by seeded random play"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position()
+        for _ in range(rng.randrange(plies[0], plies[1] + 1, 2)):
+            moves = position.moves()
+            if not moves:
+                break
+            position = position.play(rng.choice(moves))
+        if position.turn == WHITE and position.moves() and not position.winner():
+            positions.append(position)
+    return positions
+
+
+def timed_search(engine, position):
+    result = engine.search(position)
+    return result.move, result.stats.time, result.stats.nodes
+
+
+def bench_parallel(args):
+    positions = sample_positions(args.positions, args.seed)
+    print(f"{'depth':>5} {'serial s':>10} {'parallel s':>11} {'speedup':>8} {'serial n/s':>11} {'same move':>10}")
+    for depth in args.depths:
+        serial_time = parallel_time = 0.0
+        serial_nodes = 0
+        same = 0
+        serial = Engine(args.difficulty, time_budget=None, max_depth=depth)
+        parallel = Engine(args.difficulty, time_budget=None, max_depth=depth, workers=args.workers)
+        try:
+            for position in positions:
+                # Fresh tables for every position so neither side profits from the last one
+                serial.reset()
+                parallel.reset()
+                serial_move, elapsed, nodes = timed_search(serial, position)
+                serial_time += elapsed
+                serial_nodes += nodes
+                parallel_move, elapsed, _ = timed_search(parallel, position)
+                parallel_time += elapsed
+                same += serial_move == parallel_move
+        finally:
+            parallel.close()
+        print(f"{depth:>5} {serial_time:>10.2f} {parallel_time:>11.2f} {serial_time / parallel_time:>7.2f}x "
+              f"{serial_nodes / serial_time:>11.0f} {same:>5}/{len(positions)}")
+
+
+def _walk_position(position, depth):
+    if depth == 0:
+        return 1
+    return 1 + sum(_walk_position(position.play(move), depth - 1) for move in position.moves())
+
+
+def _walk_board(board, color, depth):
+    if depth == 0:
+        return 1
+    nodes = 1
+    opponent = RED if color == WHITE else WHITE
+    for move in board.legal_moves(color):
+        record = board.apply_move(*move)
+        nodes += _walk_board(board, opponent, depth - 1)
+        board.undo_move(record)
+    return nodes
+
+
+def bench_movegen(args):
+    # Nodes per second of a full walk of the move tree on each representation:
+    # Board makes and takes back moves in place, as the engine's search does;
+    # Position makes a new position per move
+    positions = [Position()] + sample_positions(args.positions, args.seed, plies=(11, 21))
+    print(f"{'position':>8} {'nodes':>8} {'Board n/s':>10} {'Position n/s':>13} {'ratio':>6}")
+    for number, position in enumerate(positions):
+        start = time.perf_counter()
+        nodes = _walk_board(position.to_board(), position.turn, args.depth)
+        board_rate = nodes / (time.perf_counter() - start)
+        start = time.perf_counter()
+        _walk_position(position, args.depth)
+        position_rate = nodes / (time.perf_counter() - start)
+        print(f"{'start' if number == 0 else number:>8} {nodes:>8} {board_rate:>10.0f} {position_rate:>13.0f} "
+              f"{position_rate / board_rate:>5.2f}x")
+
+
+def bench_batch_eval(args):
+    # Per-position cost of scalar evaluate() against encoding plus one
+    # evaluate_batch call, for growing batch sizes
+    engine = Engine(args.difficulty)
+    pool = [position.to_board() for position in sample_positions(64, args.seed, plies=(5, 60))]
+    print(f"{'batch':>6} {'scalar us':>10} {'batch us':>9} {'encode us':>10} {'winner':>7}")
+    crossover = None
+    for size in args.sizes:
+        boards = [pool[i % len(pool)] for i in range(size)]
+        repeats = max(1, args.positions // size)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for board in boards:
+                engine.evaluate(board)
+        scalar = (time.perf_counter() - start) / (repeats * size)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for board in boards:
+                encode(board)
+        encoding = (time.perf_counter() - start) / (repeats * size)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            evaluate_batch([encode(board) for board in boards], args.difficulty)
+        batch = (time.perf_counter() - start) / (repeats * size)
+
+        if crossover is None and batch < scalar:
+            crossover = size
+        print(f"{size:>6} {scalar * 1e6:>10.1f} {batch * 1e6:>9.1f} {encoding * 1e6:>10.1f} "
+              f"{'batch' if batch < scalar else 'scalar':>7}")
+    if crossover:
+        print(f"Batch evaluation is faster from {crossover} positions per call")
+    else:
+        print("Batch evaluation was not faster at any size tried")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkers engine benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parallel = commands.add_parser('parallel', help="serial vs parallel root search speedup")
+    parallel.add_argument('--depths', type=int, nargs='+', default=[6, 7, 8, 9, 10])
+    parallel.add_argument('--workers', type=int, default=4)
+    parallel.add_argument('--positions', type=int, default=5)
+    parallel.add_argument('--difficulty', default='hard')
+    parallel.add_argument('--seed', type=int, default=0)
+    parallel.set_defaults(run=bench_parallel)
+
+    movegen = commands.add_parser('movegen', help="Board vs bitboard Position move generation speed")
+    movegen.add_argument('--depth', type=int, default=6)
+    movegen.add_argument('--positions', type=int, default=3, help="middlegame positions after the start")
+    movegen.add_argument('--seed', type=int, default=2)
+    movegen.set_defaults(run=bench_movegen)
+
+    batch = commands.add_parser('batch-eval', help="scalar vs NumPy batch leaf evaluation crossover")
+    batch.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64, 128, 256, 1024])
+    batch.add_argument('--positions', type=int, default=4096, help="positions evaluated per size")
+    batch.add_argument('--difficulty', default='very_hard', choices=['easy', 'hard', 'very_hard'])
+    batch.add_argument('--seed', type=int, default=0)
+    batch.set_defaults(run=bench_batch_eval)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
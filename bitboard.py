@@ -0,0 +1,352 @@
+from constants import ROWS, COLS, WHITE, RED
+
+# Compact position representation: snapshots of a game, tablebase indexing,
+# perft, PDN/FEN and the positions sent to worker processes.
+#
+# Only the 32 dark squares are playable, so a position fits in three 32-bit
+# masks (white pieces, red pieces, kings) plus the side to move. Square
+# indices run row by row over the dark squares: index = row * 4 + col // 2.
+# The rules mirror Board exactly: forced captures, multi-jump chains keyed by
+# their final landing square, promotion on the far row and regicide.
+#
+# The engine searches on Board, not here. Its evaluators, move ordering,
+# Zobrist hash and piece-square totals all read or update Board in place
+# as moves are made and taken back. Moving the search here would only
+# speed up move generation, and generation is about half of search time
+# (benchmark.py movegen has the numbers).
+
+SQUARES = 32
+FULL = (1 << SQUARES) - 1
+
+# Diagonal directions, in the same order as Board.get_movement_directions
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+KING_DIRS = (0, 1, 2, 3)
+WHITE_DIRS = (2, 3)  # White men move down the board
+RED_DIRS = (0, 1)  # Red men move up the board
+
+PROMOTION_MASK = 0xF | (0xF << 28)  # Rows 0 and 7
+
+
+def square_index(row, col):
+    return row * 4 + col // 2
+
+
+def square_coords(sq):
+    row = sq // 4
+    return row, 2 * (sq % 4) + (1 - row % 2)
+
+
+def _build_tables():
+    steps = [[-1] * 4 for _ in range(SQUARES)]
+    jumps = [[None] * 4 for _ in range(SQUARES)]
+    for sq in range(SQUARES):
+        row, col = square_coords(sq)
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            if 0 <= row + dr < ROWS and 0 <= col + dc < COLS:
+                steps[sq][d] = square_index(row + dr, col + dc)
+            if 0 <= row + 2 * dr < ROWS and 0 <= col + 2 * dc < COLS:
+                jumps[sq][d] = (square_index(row + dr, col + dc), square_index(row + 2 * dr, col + 2 * dc))
+
+    # A diagonal step is a constant shift for every source square in a row of
+    # the same parity, so each direction is two (mask, shift) pairs.
+    shifts = []
+    for d in range(4):
+        pairs = []
+        for parity in (0, 1):
+            mask, shift = 0, 0
+            for sq in range(SQUARES):
+                if (sq // 4) % 2 == parity and steps[sq][d] >= 0:
+                    mask |= 1 << sq
+                    shift = steps[sq][d] - sq
+            pairs.append((mask, shift))
+        shifts.append(tuple(pairs))
+    return steps, jumps, shifts
+
+
+STEPS, JUMPS, STEP_SHIFTS = _build_tables()
+
+
+def _shift(bits, shift):
+    return bits << shift if shift > 0 else bits >> -shift
+
+
+def step_targets(bits, d):
+    """Shift every square in bits one diagonal step in direction d"""
+    (even_mask, even_shift), (odd_mask, odd_shift) = STEP_SHIFTS[d]
+    return (_shift(bits & even_mask, even_shift) | _shift(bits & odd_mask, odd_shift)) & FULL
+
+
+def step_sources(bits, d):
+    """Inverse of step_targets: squares that reach bits with one step in direction d"""
+    (even_mask, even_shift), (odd_mask, odd_shift) = STEP_SHIFTS[d]
+    return (_shift(bits, -even_shift) & even_mask) | (_shift(bits, -odd_shift) & odd_mask)
+
+
+# PDN numbers the dark squares 1-32 starting from the side that moves first,
+# here red, which it calls black ("B"); white is "W"
+PDN_COLORS = {RED: 'B', WHITE: 'W'}
+
+
+def pdn_square(sq):
+    return SQUARES - sq
+
+
+def from_pdn_square(number):
+    if not 1 <= number <= SQUARES:
+        raise ValueError(f"no square {number}")
+    return SQUARES - number
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class Position:
+    __slots__ = ('white', 'red', 'kings', 'turn')
+
+    def __init__(self, white=0xFFF, red=0xFFF << 20, kings=0, turn=RED):
+        self.white = white
+        self.red = red
+        self.kings = kings
+        self.turn = turn
+
+    @classmethod
+    def from_board(cls, board, turn=RED):
+        white = red = kings = 0
+        for row in range(ROWS):
+            for col in range((row + 1) % 2, COLS, 2):
+                piece = board.get_piece(row, col)
+                if piece:
+                    bit = 1 << square_index(row, col)
+                    if piece.color == WHITE:
+                        white |= bit
+                    else:
+                        red |= bit
+                    if piece.king:
+                        kings |= bit
+        return cls(white, red, kings, turn)
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Parse a PDN FEN string such as B:W21-32:B1-12 (side to move, then each
+        side's squares; K marks a king and a-b a range of squares)"""
+        fields = fen.strip().strip('"').rstrip('.').split(':')
+        colors = {'B': RED, 'W': WHITE}
+        if len(fields) != 3 or fields[0].strip().upper() not in colors:
+            raise ValueError(f"bad FEN {fen!r}")
+        sides = {WHITE: 0, RED: 0}
+        kings = 0
+        for field in fields[1:]:
+            field = field.strip()
+            color = colors.get(field[:1].upper())
+            if color is None:
+                raise ValueError(f"bad FEN {fen!r}")
+            for item in filter(None, (item.strip() for item in field[1:].split(','))):
+                king = item[:1].upper() == 'K'
+                first, _, last = item[king:].partition('-')
+                for number in range(int(first), int(last or first) + 1):
+                    bit = 1 << from_pdn_square(number)
+                    sides[color] |= bit
+                    if king:
+                        kings |= bit
+        if sides[WHITE] & sides[RED]:
+            raise ValueError(f"FEN {fen!r} puts both sides on one square")
+        return cls(sides[WHITE], sides[RED], kings, colors[fields[0].strip().upper()])
+
+    def fen(self):
+        """The position as a PDN FEN string"""
+        fields = [PDN_COLORS[self.turn]]
+        for color, bits in ((WHITE, self.white), (RED, self.red)):
+            squares = sorted((pdn_square(sq), self.kings >> sq & 1) for sq in iter_bits(bits))
+            fields.append(PDN_COLORS[color] + ','.join(f"{'K' if king else ''}{number}" for number, king in squares))
+        return ':'.join(fields)
+
+    def to_board(self, game=None):
+        # Imported here because board.py imports bitboard, so a module-level
+        # import would be circular
+        from board import Board
+        from piece import Piece
+        from evaluation import score_board
+        from zobrist import hash_board
+
+        board = Board(game)
+        for row in board.board:
+            for square in row:
+                square.remove_piece()
+        board.red_left = board.white_left = 0
+        board.red_kings = board.white_kings = 0
+        for color, bits in ((WHITE, self.white), (RED, self.red)):
+            for sq in iter_bits(bits):
+                row, col = square_coords(sq)
+                piece = Piece(row, col, color, bool(self.kings >> sq & 1))
+                board.board[row][col].place_piece(piece)
+                if color == WHITE:
+                    board.white_left += 1
+                    board.white_kings += piece.king
+                else:
+                    board.red_left += 1
+                    board.red_kings += piece.king
+        board.hash = hash_board(board)
+        board.pst_scores = score_board(board)
+        return board
+
+    def _sides(self, color):
+        if color == WHITE:
+            return self.white, self.red, WHITE_DIRS
+        return self.red, self.white, RED_DIRS
+
+    def _movers(self, color):
+        # Returns (movers, dirs) groups: men with their forward directions, kings with all four
+        own, _, man_dirs = self._sides(color)
+        return ((own & ~self.kings, man_dirs), (own & self.kings, KING_DIRS))
+
+    def capture_sources(self, color):
+        """Bitmask of the pieces of color that have at least one capture"""
+        _, opp, _ = self._sides(color)
+        empty = ~(self.white | self.red) & FULL
+        sources = 0
+        for movers, dirs in self._movers(color):
+            for d in dirs:
+                # Opponent one step away, empty square two steps away
+                landing = step_targets(step_targets(movers, d) & opp, d) & empty
+                sources |= step_sources(step_sources(landing, d), d) & movers
+        return sources
+
+    def step_sources_mask(self, color):
+        """Bitmask of the pieces of color that have a non-capturing move"""
+        empty = ~(self.white | self.red) & FULL
+        sources = 0
+        for movers, dirs in self._movers(color):
+            for d in dirs:
+                sources |= step_sources(empty, d) & movers
+        return sources
+
+    def has_moves(self, color):
+        return bool(self.step_sources_mask(color) or self.capture_sources(color))
+
+    def _capture_chains(self, sq, dirs, opp, occupied, visited, captured, path):
+        # Depth-first over jump chains. Like Board.compute_capture_paths, captured
+        # pieces stay on the board until the move completes, the moving piece keeps
+        # its start square occupied and only maximal chains are reported.
+        chains = {}
+        for d in dirs:
+            jump = JUMPS[sq][d]
+            if jump is None:
+                continue
+            over, land = jump
+            land_bit = 1 << land
+            if visited & land_bit or not opp >> over & 1 or occupied & land_bit:
+                continue
+            captured.append(over)
+            path.append(land)
+            sub = self._capture_chains(land, dirs, opp, occupied, visited | land_bit, captured, path)
+            if sub:
+                chains.update(sub)
+            else:
+                chains[land] = (tuple(captured), tuple(path[:-1]))
+            path.pop()
+            captured.pop()
+        return chains
+
+    def moves(self):
+        """Legal moves for the side to move as (src, dst, captures, landings) tuples
+
+        captures are the jumped squares in order, landings the intermediate landing
+        squares of a multi-jump. Captures are forced.
+        """
+        own, opp, man_dirs = self._sides(self.turn)
+        occupied = self.white | self.red
+        moves = []
+        capturers = self.capture_sources(self.turn)
+        if capturers:
+            for src in iter_bits(capturers):
+                dirs = KING_DIRS if self.kings >> src & 1 else man_dirs
+                chains = self._capture_chains(src, dirs, opp, occupied, 0, [], [])
+                for dst, (captures, landings) in chains.items():
+                    moves.append((src, dst, captures, landings))
+            return moves
+
+        empty = ~occupied & FULL
+        for src in iter_bits(self.step_sources_mask(self.turn)):
+            dirs = KING_DIRS if self.kings >> src & 1 else man_dirs
+            for d in dirs:
+                dst = STEPS[src][d]
+                if dst >= 0 and empty >> dst & 1:
+                    moves.append((src, dst, (), ()))
+        return moves
+
+    def play(self, move):
+        """Return the position after move; positions are never modified in place"""
+        src, dst, captures, _ = move
+        src_bit, dst_bit = 1 << src, 1 << dst
+        captured = 0
+        for sq in captures:
+            captured |= 1 << sq
+
+        white, red, kings = self.white, self.red, self.kings
+        if self.turn == WHITE:
+            white ^= src_bit | dst_bit
+            red &= ~captured
+        else:
+            red ^= src_bit | dst_bit
+            white &= ~captured
+
+        # Kings keep their crown; men are crowned on the far row or by regicide
+        crowned = kings & src_bit or dst_bit & PROMOTION_MASK or kings & captured
+        kings &= ~(src_bit | captured)
+        if crowned:
+            kings |= dst_bit
+        return Position(white, red, kings, RED if self.turn == WHITE else WHITE)
+
+    def winner(self):
+        # Same order of checks as Board.winner
+        if not self.red:
+            return WHITE
+        if not self.white:
+            return RED
+        if not self.has_moves(RED):
+            return WHITE
+        if not self.has_moves(WHITE):
+            return RED
+        return None
+
+    def counts(self):
+        """(red_left, white_left, red_kings, white_kings), matching the Board counters"""
+        return (bin(self.red).count('1'), bin(self.white).count('1'),
+                bin(self.red & self.kings).count('1'), bin(self.white & self.kings).count('1'))
+
+    def key(self):
+        return self.white, self.red, self.kings, self.turn
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __getstate__(self):
+        return self.key()
+
+    def __setstate__(self, state):
+        self.white, self.red, self.kings, self.turn = state
+
+    def __repr__(self):
+        rows = []
+        for row in range(ROWS):
+            line = ''
+            for col in range(COLS):
+                if (row + col) % 2 == 0:
+                    line += ' '
+                    continue
+                bit = 1 << square_index(row, col)
+                if self.white & bit:
+                    line += 'W' if self.kings & bit else 'w'
+                elif self.red & bit:
+                    line += 'R' if self.kings & bit else 'r'
+                else:
+                    line += '.'
+            rows.append(line)
+        return f"Position({self.turn} to move)\n" + '\n'.join(rows)
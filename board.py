@@ -1,25 +1,57 @@
-import tkinter as tk
-from constants import ROWS, COLS, BLACK, WHITE, RED, GREY, SQUARE_SIZE, CROWN
+from constants import ROWS, COLS, WHITE, RED
 from piece import Piece
+from evaluation import DEFENSIVE, COMPREHENSIVE, piece_square
+from zobrist import piece_key
+from bitboard import square_index
+
+# Piece types for the move tables
+WHITE_MAN, RED_MAN, KING = 0, 1, 2
+
+# Movement directions per piece type: men move forward, kings in all four directions
+PIECE_DIRECTIONS = (
+    ((1, -1), (1, 1)),
+    ((-1, -1), (-1, 1)),
+    ((-1, -1), (-1, 1), (1, -1), (1, 1)),
+)
+
+
+def _build_move_tables():
+    # For every square and piece type: the on-board squares one diagonal step
+    # away, and the (over_row, over_col, jump_row, jump_col) of every jump that
+    # stays on the board, in PIECE_DIRECTIONS order. Built once at import so
+    # move generation needs no bounds checks or direction arithmetic.
+    steps = [[None] * COLS for _ in range(ROWS)]
+    jumps = [[None] * COLS for _ in range(ROWS)]
+    for row in range(ROWS):
+        for col in range(COLS):
+            steps[row][col] = tuple(
+                tuple((row + dr, col + dc) for dr, dc in directions
+                      if 0 <= row + dr < ROWS and 0 <= col + dc < COLS)
+                for directions in PIECE_DIRECTIONS)
+            jumps[row][col] = tuple(
+                tuple((row + dr, col + dc, row + 2 * dr, col + 2 * dc) for dr, dc in directions
+                      if 0 <= row + 2 * dr < ROWS and 0 <= col + 2 * dc < COLS)
+                for directions in PIECE_DIRECTIONS)
+    return steps, jumps
+
+
+STEP_TABLE, JUMP_TABLE = _build_move_tables()
+
+
+def piece_type(piece):
+    if piece.king:
+        return KING
+    return WHITE_MAN if piece.color == WHITE else RED_MAN
 
 
 class Square:
+    __slots__ = ('piece',)
+
     def __init__(self, piece=None):
         self.piece = piece
-        self.row = None
-        self.col = None
 
     def clone(self):
-        new_square = Square()
-        if self.piece:
-            new_square.piece = self.piece.clone()
-        new_square.row = self.row
-        new_square.col = self.col
-        return new_square
-
-    def set_position(self, row, col):
-        self.row = row
-        self.col = col
+        return Square(self.piece.clone() if self.piece else None)
 
     def place_piece(self, piece):
         self.piece = piece
@@ -36,76 +68,122 @@ class Square:
         return "Empty"
 
 
+class MoveRecord:
+    """Undo information returned by Board.apply_move"""
+    __slots__ = ('piece', 'start', 'end', 'captured', 'promoted', 'regicide', 'deltas', 'hash', 'pst_scores')
+
+    def __init__(self, piece, start, end, captured, promoted, regicide, deltas, hash, pst_scores):
+        self.piece = piece
+        self.start = start  # (row, col) the piece moved from
+        self.end = end  # (row, col) the piece landed on
+        self.captured = captured  # tuple of (row, col, piece, was_king)
+        self.promoted = promoted  # crowned by reaching the far row
+        self.regicide = regicide  # crowned by capturing a king
+        self.deltas = deltas  # changes to (red_left, white_left, red_kings, white_kings)
+        self.hash = hash  # board hash before the move
+        self.pst_scores = pst_scores  # piece-square totals before the move
+
+    def __repr__(self):
+        return f"MoveRecord({self.piece!r} {self.start}->{self.end}, captured={len(self.captured)})"
+
+
+class AttackMap:
+    """Who can jump whom in a position, found in one pass over the board
+
+    Every field maps a color to a bitmask of that side's pieces, in bitboard
+    square numbering (bitboard.square_index), except steps:
+    pieces - all of the side's pieces
+    capturers - pieces with a jump to make
+    protected - pieces with a friend on a square behind them, or an empty
+                square to step to
+    steps - the number of free squares the pieces without a jump can step to
+    """
+    __slots__ = ('pieces', 'capturers', 'protected', 'steps')
+
+    def __init__(self, board):
+        pieces = {WHITE: 0, RED: 0}
+        capturers = {WHITE: 0, RED: 0}
+        protected = {WHITE: 0, RED: 0}
+        steps = {WHITE: 0, RED: 0}
+        grid = board.board
+        for row in range(ROWS):
+            for col in range((row + 1) % 2, COLS, 2):
+                piece = grid[row][col].piece
+                if piece is None:
+                    continue
+                color = piece.color
+                kind = piece_type(piece)
+                bit = 1 << square_index(row, col)
+                pieces[color] |= bit
+                for next_row, next_col, jump_row, jump_col in JUMP_TABLE[row][col][kind]:
+                    target = grid[next_row][next_col].piece
+                    if target is not None and target.color != color and grid[jump_row][jump_col].piece is None:
+                        capturers[color] |= bit
+                        break
+                free = 0
+                for next_row, next_col in STEP_TABLE[row][col][kind]:
+                    if grid[next_row][next_col].piece is None:
+                        free += 1
+                if free:
+                    protected[color] |= bit
+                    if not capturers[color] & bit:
+                        steps[color] += free
+                else:
+                    # The squares behind: a man's backward steps, all four for a king
+                    behind = KING if piece.king else RED_MAN if color == WHITE else WHITE_MAN
+                    for next_row, next_col in STEP_TABLE[row][col][behind]:
+                        friend = grid[next_row][next_col].piece
+                        if friend is not None and friend.color == color:
+                            protected[color] |= bit
+                            break
+        self.pieces = pieces
+        self.capturers = capturers
+        self.protected = protected
+        self.steps = steps
+
+
 class Board:
     def __init__(self, game=None):
         self.game = game
-        self.crown_image = None
         self.board = [[Square() for _ in range(COLS)] for _ in range(ROWS)]  # 8x8 board
         self.red_left = self.white_left = 12  # Number of pieces each player has
         self.red_kings = self.white_kings = 0
-        # self.load_images()
+        self.hash = 0  # Zobrist hash of the pieces, kept up to date by every move
+        self.pst_scores = [0.0, 0.0]  # Running piece-square totals, indexed as in evaluation
         self.setup_board()
 
     def clone(self):
-        new_board = Board()
+        new_board = Board.__new__(Board)  # Skip setting up a board that is about to be replaced
         new_board.game = self.game  # Maintain the same game reference
-        new_board.crown_image = self.crown_image  # Maintain the same image reference
         new_board.red_left = self.red_left
         new_board.white_left = self.white_left
         new_board.red_kings = self.red_kings
         new_board.white_kings = self.white_kings
-
-        for i in range(ROWS):
-            for j in range(COLS):
-                new_board.board[i][j] = self.board[i][j].clone()  # Use the new clone method for squares
-
+        new_board.hash = self.hash
+        new_board.pst_scores = list(self.pst_scores)
+        new_board.board = [[square.clone() for square in row] for row in self.board]
         return new_board
 
-    def load_images(self):
-        # if not self.crown_image:
-        #     self.crown_image = tk.PhotoImage(file=CROWN).subsample(64, 64)
-        try:
-            self.crown_image = tk.PhotoImage(file=CROWN).subsample(64, 64)
-            print("Crown image loaded successfully.")
-        except Exception as e:
-            print(f"Failed to load crown image: {e}")
-
-    @staticmethod
-    def draw_squares(canvas):
-        canvas.config(bg=GREY)
-        for row in range(ROWS):
-            for col in range((row + 1) % 2, ROWS, 2):
-                x0 = col * SQUARE_SIZE
-                y0 = row * SQUARE_SIZE
-                x1 = x0 + SQUARE_SIZE
-                y1 = y0 + SQUARE_SIZE
-                canvas.create_rectangle(x0, y0, x1, y1, fill=BLACK, outline="")
-
     def setup_board(self):
         for row in range(ROWS):
             for col in range(COLS):
                 if row % 2 == ((col + 1) % 2):
                     if row < 3:
-                        piece = Piece(row, col, WHITE, self, self.crown_image)
+                        piece = Piece(row, col, WHITE)
                         self.board[row][col].place_piece(piece)
+                        self.hash ^= piece_key(piece, row, col)
+                        self._add_scores(piece, row, col)
                     elif row > 4:
-                        piece = Piece(row, col, RED, self, self.crown_image)
+                        piece = Piece(row, col, RED)
                         self.board[row][col].place_piece(piece)
-
-    def draw(self, canvas):
-        try:
-            self.draw_squares(canvas)
-            for row in self.board:
-                for square in row:
-                    if square and square.is_occupied():
-                        square.piece.draw(canvas)
-        except Exception as e:
-            print(f"Error drawing board: {e}")
-            raise e
+                        self.hash ^= piece_key(piece, row, col)
+                        self._add_scores(piece, row, col)
 
     def move_piece(self, start_row, start_col, end_row, end_col):
         piece = self.get_piece(start_row, start_col)
         if piece and not self.is_square_occupied(end_row, end_col):
+            self.hash ^= piece_key(piece, start_row, start_col)
+            self._add_scores(piece, start_row, start_col, -1)
             # Move the piece
             self.board[end_row][end_col].place_piece(piece)
             self.board[start_row][start_col].remove_piece()
@@ -115,7 +193,6 @@ class Board:
 
             # Promote to king if it reaches the last row and is not already a king
             if end_row in [0, ROWS - 1] and not piece.king:
-                print("Assigning crown image to a white piece.")
                 piece.make_king()
                 if piece.color == RED:
                     self.red_kings += 1
@@ -123,6 +200,8 @@ class Board:
                 else:
                     self.white_kings += 1
                     print(f"White kings increased in white king's row: {self.white_kings}")
+            self.hash ^= piece_key(piece, end_row, end_col)
+            self._add_scores(piece, end_row, end_col)
 
     # Remove the captured piece(s) from the board
     def remove(self, captures, capturing_piece):
@@ -132,8 +211,14 @@ class Board:
             if piece:
                 self.update_pieces_left(piece)  # Update the count of pieces left
                 self.get_square(row, col).remove_piece()  # Remove the captured piece from the board
+                self.hash ^= piece_key(piece, row, col)
+                self._add_scores(piece, row, col, -1)
                 if piece.king and not capturing_piece.king:
+                    self.hash ^= piece_key(capturing_piece, capturing_piece.row, capturing_piece.col)
+                    self._add_scores(capturing_piece, capturing_piece.row, capturing_piece.col, -1)
                     capturing_piece.make_king()  # Promote the capturing piece if it captures a king
+                    self.hash ^= piece_key(capturing_piece, capturing_piece.row, capturing_piece.col)
+                    self._add_scores(capturing_piece, capturing_piece.row, capturing_piece.col)
                     regicide_occurred = True
                     if capturing_piece.color == RED:
                         self.red_kings += 1
@@ -143,6 +228,90 @@ class Board:
                         print(f"White kings increased by regicide: {self.white_kings}")
         return regicide_occurred
 
+    # In-place move application for the search. Unlike move_piece/remove this
+    # stays quiet and returns a MoveRecord so the move can be taken back.
+    def apply_move(self, start_row, start_col, end_row, end_col, captures=()):
+        piece = self.board[start_row][start_col].piece
+        self.board[start_row][start_col].piece = None
+        self.board[end_row][end_col].piece = piece
+        piece.move(end_row, end_col)
+        old_hash = self.hash
+        h = old_hash ^ piece_key(piece, start_row, start_col)
+        old_scores = self.pst_scores
+        values = piece_square(piece, start_row, start_col)
+        defensive = old_scores[DEFENSIVE] - values[DEFENSIVE]
+        comprehensive = old_scores[COMPREHENSIVE] - values[COMPREHENSIVE]
+
+        red_left = white_left = red_kings = white_kings = 0
+        promoted = regicide = False
+        if end_row in (0, ROWS - 1) and not piece.king:
+            piece.king = True
+            promoted = True
+
+        captured = []
+        for row, col in captures:
+            victim = self.board[row][col].piece
+            if victim is None:
+                continue
+            captured.append((row, col, victim, victim.king))
+            self.board[row][col].piece = None
+            h ^= piece_key(victim, row, col)
+            values = piece_square(victim, row, col)
+            defensive -= values[DEFENSIVE]
+            comprehensive -= values[COMPREHENSIVE]
+            if victim.color == RED:
+                red_left -= 1
+                red_kings -= victim.king
+            else:
+                white_left -= 1
+                white_kings -= victim.king
+            if victim.king and not piece.king:
+                piece.king = True
+                regicide = True
+
+        if promoted or regicide:
+            if piece.color == RED:
+                red_kings += 1
+            else:
+                white_kings += 1
+
+        self.red_left += red_left
+        self.white_left += white_left
+        self.red_kings += red_kings
+        self.white_kings += white_kings
+        self.hash = h ^ piece_key(piece, end_row, end_col)
+        values = piece_square(piece, end_row, end_col)
+        self.pst_scores = [defensive + values[DEFENSIVE], comprehensive + values[COMPREHENSIVE]]
+        return MoveRecord(piece, (start_row, start_col), (end_row, end_col), tuple(captured),
+                          promoted, regicide, (red_left, white_left, red_kings, white_kings), old_hash,
+                          old_scores)
+
+    def undo_move(self, record):
+        piece = record.piece
+        if record.promoted or record.regicide:
+            piece.king = False
+        for row, col, victim, was_king in record.captured:
+            victim.king = was_king
+            self.board[row][col].piece = victim
+        end_row, end_col = record.end
+        start_row, start_col = record.start
+        self.board[end_row][end_col].piece = None
+        self.board[start_row][start_col].piece = piece
+        piece.move(start_row, start_col)
+
+        red_left, white_left, red_kings, white_kings = record.deltas
+        self.red_left -= red_left
+        self.white_left -= white_left
+        self.red_kings -= red_kings
+        self.white_kings -= white_kings
+        self.hash = record.hash
+        self.pst_scores = record.pst_scores
+
+    def _add_scores(self, piece, row, col, sign=1):
+        values = piece_square(piece, row, col)
+        self.pst_scores[DEFENSIVE] += sign * values[DEFENSIVE]
+        self.pst_scores[COMPREHENSIVE] += sign * values[COMPREHENSIVE]
+
     def update_pieces_left(self, piece):
         if piece.color == RED:
             self.red_left -= 1
@@ -177,15 +346,61 @@ class Board:
         return None  # No winner yet
 
     def check_moves_available(self, color):
-        # Iterate over all squares to find pieces of the given color
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                piece = self.get_piece(row, col)
+        # Stops at the first step or jump found, without building any moves
+        grid = self.board
+        for row in range(ROWS):
+            for col in range((row + 1) % 2, COLS, 2):
+                piece = grid[row][col].piece
+                if piece is None or piece.color != color:
+                    continue
+                kind = piece_type(piece)
+                for next_row, next_col in STEP_TABLE[row][col][kind]:
+                    if grid[next_row][next_col].piece is None:
+                        return True
+                for next_row, next_col, jump_row, jump_col in JUMP_TABLE[row][col][kind]:
+                    opponent = grid[next_row][next_col].piece
+                    if opponent is not None and opponent.color != color and grid[jump_row][jump_col].piece is None:
+                        return True
+        return False
+
+    def get_all_valid_moves(self, color):
+        """Valid moves of every piece of color, keyed by piece position; captures are forced"""
+        player_valid_moves = {}
+        player_capture_moves = {}
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col].piece
                 if piece and piece.color == color:
-                    # Check if there are any valid moves for this piece
-                    if self.get_valid_moves(piece, row, col):
-                        return True  # There is at least one move available
-        return False  # No moves available for this color
+                    valid_moves = self.get_valid_moves(piece, row, col)
+                    if any(move_info['captures'] for move_info in valid_moves.values()):
+                        player_capture_moves[(row, col)] = valid_moves
+                    else:
+                        player_valid_moves[(row, col)] = valid_moves
+        return player_capture_moves if player_capture_moves else player_valid_moves
+
+    def legal_moves(self, color):
+        """The moves of get_all_valid_moves, in the same order, as (start_row, start_col,
+        end_row, end_col, captures) tuples and without building its dicts"""
+        grid = self.board
+        captures = []
+        steps = []
+        for row in range(ROWS):
+            for col in range((row + 1) % 2, COLS, 2):
+                piece = grid[row][col].piece
+                if piece is None or piece.color != color:
+                    continue
+                # Chains are keyed by where they end, the last one found winning, as in get_valid_moves
+                chains = {}
+                for end_row, end_col, captured, _ in self.capture_chains(piece, row, col):
+                    chains[(end_row, end_col)] = captured
+                if chains:
+                    captures.extend((row, col, end_row, end_col, captured)
+                                    for (end_row, end_col), captured in chains.items())
+                elif not captures:
+                    for next_row, next_col in STEP_TABLE[row][col][piece_type(piece)]:
+                        if grid[next_row][next_col].piece is None:
+                            steps.append((row, col, next_row, next_col, ()))
+        return captures or steps
 
     # HELPER FUNCTIONS:
     # Check if the square is occupied
@@ -238,11 +453,8 @@ class Board:
 
     @staticmethod
     def get_movement_directions(piece):
-        if piece.king:
-            return [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # Kings move in all four diagonal directions
-        else:
-            return [(1, -1), (1, 1)] if piece.color == WHITE else [(-1, -1),
-                                                                   (-1, 1)]  # Non-kings move forward diagonally
+        # Kings move in all four diagonal directions, non-kings move forward diagonally
+        return PIECE_DIRECTIONS[piece_type(piece)]
 
     # MOVES AND CAPTURES LOGIC:
     # Get the valid moves for the selected piece
@@ -251,12 +463,9 @@ class Board:
         captures = self.compute_capture_paths(piece, row, col)
 
         # Check if there are any captures, if not, consider normal moves
-        if not any(captures.values()):  # If there are no capture paths
-            directions = self.get_movement_directions(piece)
-            for dr, dc in directions:
-                next_row = row + dr
-                next_col = col + dc
-                if self._on_board(next_row, next_col) and not self.is_square_occupied(next_row, next_col):
+        if not captures:  # If there are no capture paths
+            for next_row, next_col in STEP_TABLE[row][col][piece_type(piece)]:
+                if self.board[next_row][next_col].piece is None:
                     # Add the move as a key with an empty dictionary for its value
                     valid_moves[(next_row, next_col)] = {
                         'captures': [],
@@ -266,39 +475,71 @@ class Board:
             valid_moves.update(captures)
         return valid_moves
 
-    def compute_capture_paths(self, piece, start_row, start_col, path=None, visited=None, captures=None):
-        if path is None:
-            path = []
-        if visited is None:
-            visited = set()
-        if captures is None:
-            captures = []
-
+    def compute_capture_paths(self, piece, start_row, start_col):
         moves = {}
-        directions = self.get_movement_directions(piece)
-        for dr, dc in directions:
-            next_row, next_col = start_row + dr, start_col + dc
-            jump_row, jump_col = start_row + 2 * dr, start_col + 2 * dc
-            if self._on_board(next_row, next_col) and self._on_board(jump_row, jump_col):
-                if (jump_row, jump_col) not in visited and self.can_capture(piece, next_row, next_col, jump_row,
-                                                                            jump_col, visited):
-                    visited.add((jump_row, jump_col))  # Prevent revisiting
-                    captures.append((next_row, next_col))
-                    new_path = path + [(jump_row, jump_col)]
-                    subsequent_captures = self.compute_capture_paths(
-                        piece, jump_row, jump_col, new_path, visited.copy(), captures.copy())
-
-                    if subsequent_captures:
-                        moves.update(subsequent_captures)
-                    else:
-                        moves[(jump_row, jump_col)] = {
-                            'captures': captures.copy(),
-                            'landing_positions': path.copy()
-                        }
-                    # Backtracking: Remove the last capture
-                    captures.pop()
-                    visited.remove((jump_row, jump_col))
+        for end_row, end_col, captures, landings in self.capture_chains(piece, start_row, start_col):
+            moves[(end_row, end_col)] = {
+                'captures': list(captures),
+                'landing_positions': list(landings)
+            }
         return moves
 
+    def capture_chains(self, piece, start_row, start_col):
+        """Yield (end_row, end_col, captures, landing_positions) for every capture chain of
+        piece from its square that can't be extended, depth first
+
+        The chain is built in one buffer of JUMP_TABLE entries and backtracked, so
+        the search itself allocates nothing; captured pieces stay on the board
+        until the move is made, and a chain never lands on the same square twice.
+        """
+        grid = self.board
+        kind = piece_type(piece)
+        color = piece.color
+        # Most pieces have no capture at all; find that out before setting up the buffers
+        for over_row, over_col, jump_row, jump_col in JUMP_TABLE[start_row][start_col][kind]:
+            opponent = grid[over_row][over_col].piece
+            if opponent is not None and opponent.color != color and grid[jump_row][jump_col].piece is None:
+                break
+        else:
+            return
+
+        chain = []  # (over_row, over_col, jump_row, jump_col) of each jump so far
+        next_jump = [0]  # Per chain square: index of the next jump to try from it
+        extended = [False]  # Per chain square: whether any jump from it was found
+        row, col = start_row, start_col
+        while next_jump:
+            jumps = JUMP_TABLE[row][col][kind]
+            index = next_jump[-1]
+            while index < len(jumps):
+                jump = jumps[index]
+                index += 1
+                opponent = grid[jump[0]][jump[1]].piece
+                if opponent is None or opponent.color == color or grid[jump[2]][jump[3]].piece is not None:
+                    continue
+                for earlier in chain:
+                    if earlier[2] == jump[2] and earlier[3] == jump[3]:
+                        break
+                else:
+                    break
+            else:
+                jump = None
+            next_jump[-1] = index
+            if jump is not None:
+                extended[-1] = True
+                chain.append(jump)
+                next_jump.append(0)
+                extended.append(False)
+                row, col = jump[2], jump[3]
+                continue
+
+            # Every jump from this square is tried; backtrack
+            next_jump.pop()
+            if not extended.pop() and chain:
+                yield (row, col, tuple((jump[0], jump[1]) for jump in chain),
+                       tuple((jump[2], jump[3]) for jump in chain[:-1]))
+            if chain:
+                chain.pop()
+                row, col = (chain[-1][2], chain[-1][3]) if chain else (start_row, start_col)
+
     def __repr__(self):
         return f"{self.board}"
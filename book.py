@@ -0,0 +1,192 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+import time
+
+from bitboard import square_index
+from board import Board
+from constants import WHITE, RED
+from zobrist import position_key
+
+# Opening book. Each record is a position key (the Zobrist hash with the side
+# to move mixed in), the from and to squares of a book move in bitboard
+# numbering and the move's weight. Records are sorted by key, so the moves of
+# a position are adjacent and found by binary search over the mapped file.
+# A move is fully determined by its two squares, because capture chains are
+# keyed by their landing square.
+
+MAGIC = b'CKBK'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')  # magic, version, record count
+RECORD = struct.Struct('<QBBH')  # key, from square, to square, weight
+MAX_WEIGHT = 0xFFFF
+
+
+def move_squares(move):
+    return square_index(move[0], move[1]), square_index(move[2], move[3])
+
+
+class Book:
+    """Read-only, memory-mapped opening book"""
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.rng = random.Random(seed)
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+
+    def _key_at(self, i):
+        return struct.unpack_from('<Q', self.data, HEADER.size + i * RECORD.size)[0]
+
+    def lookup(self, key):
+        """(from square, to square, weight) for every book move of key"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        entries = []
+        while lo < self.count:
+            record_key, src, dst, weight = RECORD.unpack_from(self.data, HEADER.size + lo * RECORD.size)
+            if record_key != key:
+                break
+            entries.append((src, dst, weight))
+            lo += 1
+        return entries
+
+    def choose(self, board, color, moves):
+        """A book move from moves, picked at random by weight, or None out of book"""
+        weights = {(src, dst): weight for src, dst, weight in self.lookup(position_key(board.hash, color))}
+        # Matching against the legal moves also guards against hash collisions
+        candidates = [move for move in moves if weights.get(move_squares(move))]
+        if not candidates:
+            return None
+        return self.rng.choices(candidates, [weights[move_squares(move)] for move in candidates])[0]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+class BookBuilder:
+    def __init__(self):
+        self.weights = {}  # key -> {(from, to): weight}
+
+    def add(self, key, move, weight=1):
+        moves = self.weights.setdefault(key, {})
+        squares = move_squares(move)
+        moves[squares] = min(moves.get(squares, 0) + weight, MAX_WEIGHT)
+
+    def from_analysis(self, engine, plies, margin, max_moves, log=print):
+        """Expand the opening tree, keeping moves that score within margin of the best"""
+        def expand(board, color, depth):
+            if depth == plies or board.winner():
+                return
+            scored = []
+            for move in engine.get_successors(board, color):
+                record = board.apply_move(*move)
+                try:
+                    opponent = RED if color == WHITE else WHITE
+                    result = engine.search(board, opponent)
+                    # Scores are from the side to move after the move
+                    scored.append((-(result.score or 0.0), move))
+                finally:
+                    board.undo_move(record)
+            scored.sort(key=lambda item: item[0], reverse=True)
+            best = scored[0][0]
+            kept = [(score, move) for score, move in scored[:max_moves] if best - score <= margin]
+            for score, move in kept:
+                # The best move gets the most weight, falling off linearly to the margin
+                weight = 1 + round(99 * (1 - (best - score) / margin)) if margin else 100
+                self.add(position_key(board.hash, color), move, weight)
+            log(f"ply {depth}: {len(kept)} of {len(scored)} moves kept, {len(self.weights)} positions")
+            for _, move in kept:
+                record = board.apply_move(*move)
+                try:
+                    expand(board, RED if color == WHITE else WHITE, depth + 1)
+                finally:
+                    board.undo_move(record)
+
+        expand(Board(), RED, 0)
+
+    def from_selfplay(self, engine, games, plies, random_plies, max_plies=200, seed=0, log=print):
+        """Play engine games and weight each early move by how its side fared"""
+        rng = random.Random(seed)
+        for game in range(games):
+            board = Board()
+            color = RED
+            played = []
+            winner = None
+            for ply in range(max_plies):
+                winner = board.winner()
+                if winner:
+                    break
+                if ply < random_plies:
+                    # Random first moves keep the games apart, and are booked
+                    # like the rest, so the book covers the start and the
+                    # early replies, weighted by how they fared
+                    move = rng.choice(engine.get_successors(board, color))
+                else:
+                    move = engine.search(board, color).move
+                if ply < plies:
+                    played.append((position_key(board.hash, color), color, move))
+                board.apply_move(*move)
+                color = RED if color == WHITE else WHITE
+
+            # Two points for a win, one for a draw, none for a loss
+            for key, side, move in played:
+                weight = 1 if winner is None else 2 * (winner == side)
+                if weight:
+                    self.add(key, move, weight)
+            log(f"game {game + 1}/{games}: {winner or 'draw'}, {len(self.weights)} positions")
+
+    def write(self, path):
+        records = sorted((key, src, dst, weight)
+                         for key, moves in self.weights.items() for (src, dst), weight in moves.items())
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        return len(records)
+
+
+def main():
+    # The engine plays book moves, so it is only needed here to build one
+    from engine import Engine, DIFFICULTIES
+
+    parser = argparse.ArgumentParser(description="Build a checkers opening book")
+    parser.add_argument('mode', choices=['analysis', 'selfplay'])
+    parser.add_argument('--output', default='openings.book')
+    parser.add_argument('--difficulty', default='very_hard', choices=DIFFICULTIES)
+    parser.add_argument('--time', type=float, default=1.0, help="seconds per search")
+    parser.add_argument('--plies', type=int, default=6, help="book depth in plies")
+    parser.add_argument('--margin', type=float, default=1.0,
+                        help="analysis: keep moves scoring within this much of the best")
+    parser.add_argument('--max-moves', type=int, default=3, help="analysis: most moves kept per position")
+    parser.add_argument('--games', type=int, default=100, help="selfplay: games to play")
+    parser.add_argument('--random-plies', type=int, default=2, help="selfplay: random moves opening each game")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    engine = Engine(args.difficulty, time_budget=args.time)
+    builder = BookBuilder()
+    log = lambda message: print(message, file=sys.stderr)
+    start = time.perf_counter()
+    if args.mode == 'analysis':
+        builder.from_analysis(engine, args.plies, args.margin, args.max_moves, log)
+    else:
+        builder.from_selfplay(engine, args.games, args.plies, args.random_plies, seed=args.seed, log=log)
+    count = builder.write(args.output)
+    print(f"Wrote {count} moves for {len(builder.weights)} positions to {args.output} "
+          f"in {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,3 +10,6 @@ ROWS, COLS = 8, 8
 SQUARE_SIZE = WIDTH // COLS
 
 CROWN = "assets/crown.png"
+TABLEBASE = "endgames.tb"
+BOOK = "openings.book"
+GAMES = "games.pdn"
@@ -0,0 +1,739 @@
+import os
+import time
+from collections import OrderedDict
+from constants import RED, WHITE
+from bitboard import Position, iter_bits, square_coords, SQUARES
+from board import AttackMap
+from book import Book
+from evaluation import DEFENSIVE, COMPREHENSIVE
+from ordering import MoveOrderer
+from stats import SearchStats, JsonLinesSink, profile_call
+from tablebase import Tablebase, LOSS, DRAWN
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from zobrist import position_key
+
+# Headless search engine: position in, best move, score and statistics out.
+# Nothing here touches tkinter, so the engine runs on machines without a
+# display. Scores inside the search are from the point of view of the side
+# to move at each node, as in negamax; the iterations' scores are from
+# WHITE's, and SearchResult.score from that of the side that moved.
+
+DIFFICULTIES = ('easy', 'medium', 'hard', 'very_hard')
+
+# evaluate_strategic's position value of a piece on each bitboard square
+STRATEGIC_POSITION_VALUES = tuple(1 + (7 - abs(3.5 - square_coords(sq)[1])) * 0.1 for sq in range(SQUARES))
+
+# Roughly what a man is worth to each difficulty's evaluator, the unit of the
+# root aspiration windows. Strategic (medium) has no material term; a man's
+# position value is about 1.
+MAN_VALUES = {'easy': 1, 'medium': 1, 'hard': 2, 'very_hard': 5}
+
+# Score of a tablebase win, less the plies it takes; far above any evaluation
+TABLEBASE_WIN = 1000
+
+
+class SearchTimeout(Exception):
+    """Raised inside negamax when the move's time or node budget is used up, or it is cancelled"""
+
+
+class SearchResult:
+    __slots__ = ('move', 'score', 'depth', 'pv', 'stats')
+
+    def __init__(self, move, score, depth, pv, stats):
+        self.move = move  # (start_row, start_col, end_row, end_col, captures), or None without moves
+        self.score = score
+        self.depth = depth  # Last completed iteration
+        self.pv = pv
+        self.stats = stats
+
+    def __repr__(self):
+        return f"SearchResult(move={self.move}, score={self.score}, depth={self.depth})"
+
+
+class Engine:
+    MAX_DEPTH = 64
+    CHECK_INTERVAL = 256  # Nodes between budget checks
+    MOVE_CACHE_SIZE = 1 << 14  # Positions whose legal moves are kept
+    SCOUT_WIDTH = 1e-6  # Scores are floats, so a null window is this narrow instead of empty
+    # Root windows start this many men either side of the last iteration's score
+    ASPIRATION_WINDOW = 0.75
+    ASPIRATION_GROWTH = 4
+    ASPIRATION_LIMIT = 4  # Men; a side widened past this is left open
+
+    def __init__(self, difficulty='easy', tt_size_mb=16, time_budget=1.0, node_budget=None,
+                 max_depth=MAX_DEPTH, workers=None, batch_eval=False, tablebase=None,
+                 book=None, stats_sink=None, profile=None, profile_dir=None, quiescence=True):
+        self.difficulty = difficulty
+        # Kept across searches so earlier searches speed up later ones
+        self.tt = TranspositionTable(tt_size_mb)
+        self.orderer = MoveOrderer()
+        # Legal moves by position key, least recently used first. A node's moves
+        # are wanted again by its TT and PV checks, by the next iteration and by
+        # pondering; generating them once per position is enough.
+        self.move_cache = OrderedDict()
+
+        # Per-move search budget: seconds and/or nodes, None for no limit
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.max_depth = max_depth
+        # Follow forced captures past the nominal depth before evaluating
+        self.quiescence = quiescence
+        self.nodes = 0
+        self.qnodes = 0  # The part of nodes searched by quiescence_search
+        self.leaf_evals = 0
+        self.max_ply = 0
+        self.pvs_researches = 0  # Scouted moves that beat alpha and were searched again
+        self.aspiration_researches = 0  # Root searches repeated with a wider window
+        self.deadline = None
+        self.next_check = 0
+        self.abortable = False
+        self.cancel = None  # threading.Event that stops the search when set
+        self.depth = 0  # Iteration in progress, for progress displays
+        self.pv = []  # Principal variation of the last completed iteration
+        self.pv_moves = {}
+        self.iterations = []
+
+        # Opt-in parallel root search over this many worker processes
+        self.workers = workers
+        self.parallel = None
+
+        # Opt-in NumPy evaluation of all leaves below a frontier node in one call.
+        # batch_eval, and numpy with it, is only imported when asked for: numpy
+        # takes longer to load than the rest of the engine.
+        if batch_eval:
+            from batch_eval import available
+            if not available():
+                raise ImportError("batch_eval=True needs numpy")
+        self.batch_eval = batch_eval
+
+        # Endgame tables, given as a Tablebase or the path of a tablebase file
+        self.owns_tablebase = isinstance(tablebase, str)
+        self.tablebase = Tablebase(tablebase) if self.owns_tablebase else tablebase
+
+        # Opening book, given as a Book or the path of a book file
+        self.owns_book = isinstance(book, str)
+        self.book = Book(book) if self.owns_book else book
+        self.source = None  # How the last move was found: 'search', 'forced', 'book', 'tablebase' or 'ponder'
+
+        # Results of searches made on the opponent's time, by position key:
+        # (SearchResult, whether it used a full move's budget)
+        self.ponder_cache = {}
+
+        # Opt-in instrumentation, which the environment can also switch on:
+        # stats as JSON lines to a path or open file (CHECKERS_STATS), and a
+        # profile of every search, 'cprofile' or 'sample' (CHECKERS_PROFILE),
+        # written to profile_dir (CHECKERS_PROFILE_DIR)
+        stats_sink = stats_sink or os.environ.get('CHECKERS_STATS')
+        self.stats_sink = JsonLinesSink(stats_sink) if stats_sink else None
+        self.profile = profile or os.environ.get('CHECKERS_PROFILE')
+        self.profile_dir = profile_dir or os.environ.get('CHECKERS_PROFILE_DIR', '.')
+
+    def reset(self):
+        self.tt.clear()  # Scores depend on the difficulty, which may have changed
+        self.ponder_cache = {}
+
+    def close(self):
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        if self.owns_tablebase:
+            self.tablebase.close()
+            self.tablebase = None
+        if self.owns_book:
+            self.book.close()
+            self.book = None
+        if self.stats_sink is not None:
+            self.stats_sink.close()
+            self.stats_sink = None
+
+    def search(self, position, color=None, cancel=None):
+        """Search a Board or bitboard Position and return a SearchResult
+
+        A Board is searched in place and left as it was; color defaults to the
+        Position's side to move, or WHITE for a Board. Setting the cancel event
+        from another thread ends the search early.
+        """
+        if self.profile:
+            result = profile_call(self.profile, self.profile_dir, self._search, position, color, cancel)
+        else:
+            result = self._search(position, color, cancel)
+        if self.stats_sink is not None:
+            self.stats_sink.write({'move': result.move, 'score': result.score, 'depth': result.depth,
+                                   'pv': result.pv, **result.stats.to_dict()})
+        return result
+
+    def _search(self, position, color, cancel):
+        board, color = self._as_board(position, color)
+
+        # A reply that was pondered to a full move's budget is answered at once;
+        # one that was cut short resumes after its last completed iteration
+        pondered = self.ponder_cache.get(position_key(board.hash, color))
+        self.ponder_cache = {}
+        if pondered and pondered[1]:
+            result = pondered[0]
+            self.source = 'ponder'
+            result.stats.source = 'ponder'
+            return result
+
+        self.cancel = cancel
+        start = time.perf_counter()
+        try:
+            move = self.iterative_deepening(board, color, pondered[0] if pondered else None)
+        finally:
+            self.cancel = None
+        elapsed = time.perf_counter() - start
+
+        last = self.iterations[-1] if self.iterations else None
+        score = last['score'] if last else None
+        if score is not None and color == RED:
+            score = -score
+        stats = SearchStats(
+            source=self.source, nodes=self.nodes, qnodes=self.qnodes, leaf_evals=self.leaf_evals,
+            max_ply=self.max_ply, pvs_researches=self.pvs_researches,
+            aspiration_researches=self.aspiration_researches,
+            cutoffs=self.orderer.cutoffs, first_move_cutoffs=self.orderer.first_move_cutoffs,
+            cutoffs_by_index=dict(self.orderer.cutoffs_by_index), tt_probes=self.tt.probes, tt_hits=self.tt.hits,
+            tablebase_probes=self.tablebase.probes if self.tablebase else 0,
+            tablebase_hits=self.tablebase.hits if self.tablebase else 0,
+            time=elapsed, iterations=self.iterations)
+        return SearchResult(move, score, last['depth'] if last else 0, list(self.pv), stats)
+
+    def _as_board(self, position, color):
+        if hasattr(position, 'to_board'):
+            return position.to_board(), color or position.turn
+        return position, color or WHITE
+
+    def ponder(self, position, cancel, color=None, expected=None):
+        """Search the replies to position while the opponent thinks
+
+        color is the side about to reply and expected its predicted move, which
+        is searched first. Each reply gets a move's budget, then twice that,
+        and so on, until the cancel event is set or nothing deeper is left to
+        find. The deepest result per reply goes to ponder_cache for search.
+        """
+        board, color = self._as_board(position, color)
+        opponent = RED if color == WHITE else WHITE
+        replies = self.get_successors(board, color)
+        if expected in replies:
+            replies.remove(expected)
+            replies.insert(0, expected)
+
+        cache = {}  # search() drops ponder_cache, so results are kept aside until the end
+        budgets = self.time_budget, self.node_budget
+        try:
+            while replies and not cancel.is_set():
+                for reply in list(replies):
+                    record = board.apply_move(*reply)
+                    try:
+                        key = position_key(board.hash, opponent)
+                        result = self._search(board, opponent, cancel)
+                    finally:
+                        board.undo_move(record)
+                    if result.depth and (key not in cache or result.depth > cache[key][0].depth):
+                        cache[key] = (result, not cancel.is_set())
+                    if cancel.is_set():
+                        break
+                    if result.stats.source != 'search' or result.depth in (0, self.max_depth):
+                        replies.remove(reply)  # Nothing deeper to learn
+                if self.time_budget is None and self.node_budget is None:
+                    break
+                self.time_budget = self.time_budget and self.time_budget * 2
+                self.node_budget = self.node_budget and self.node_budget * 2
+        finally:
+            self.time_budget, self.node_budget = budgets
+            self.ponder_cache = cache
+
+    def iterative_deepening(self, board, color, resume=None):
+        # Search depth 1, 2, 3, ... until the budget runs out and return the best
+        # move of the last iteration that completed. Depth 1 always completes.
+        # resume is an earlier, unfinished SearchResult for this position to
+        # carry on from.
+        self.tt.new_search()
+        self.orderer.new_search()
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaf_evals = 0
+        self.max_ply = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.depth = 0
+        self.next_check = self.CHECK_INTERVAL
+        self.pv = []
+        self.pv_moves = {}
+        self.iterations = []
+        self.source = 'search'
+        if self.tablebase:
+            self.tablebase.probes = self.tablebase.hits = 0
+        start = time.perf_counter()
+        self.deadline = start + self.time_budget if self.time_budget else None
+
+        moves = self.get_successors(board, color)
+        if not moves:
+            return None
+        if len(moves) == 1:
+            # Forced: nothing to search, so the score is that of a leaf after the move
+            move = moves[0]
+            opponent = RED if color == WHITE else WHITE
+            record = board.apply_move(*move)
+            try:
+                if self.quiescence:
+                    score = self.quiescence_search(board, float('-inf'), float('inf'), opponent, 1)
+                    score = score if opponent == WHITE else -score
+                else:
+                    self.leaf_evals += 1
+                    score = self.evaluate(board)
+            finally:
+                board.undo_move(record)
+            self.source = 'forced'
+            self.pv = [move]
+            self.iterations.append({'depth': 0, 'score': score, 'nodes': self.nodes,
+                                    'time': time.perf_counter() - start, 'cutoffs': 0,
+                                    'first_move_cutoff_rate': 0.0})
+            return move
+
+        if self.book:
+            move = self.book.choose(board, color, moves)
+            if move:
+                self.source = 'book'
+                return move
+
+        played = self.tablebase_root(board, moves, color)
+        if played:
+            # Known endgame: the tables give the best move without a search
+            score, move = played
+            self.source = 'tablebase'
+            self.pv = [move]
+            self.iterations.append({'depth': 0, 'score': score, 'nodes': self.nodes,
+                                    'time': time.perf_counter() - start, 'cutoffs': 0,
+                                    'first_move_cutoff_rate': 0.0})
+            return move
+
+        entry = self.tt.probe(position_key(board.hash, color))
+        moves = self.orderer.order(board, moves, 0, entry[3] if entry else None)
+
+        best_move = moves[0]
+        first_depth = 1
+        sign = 1 if color == WHITE else -1
+        guess = None  # Last iteration's score, for color, which centers the next root window
+        if resume and resume.move in moves:
+            best_move = resume.move
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            self.pv = list(resume.pv)
+            self.pv_moves = self._pv_keys(board, color, self.pv)
+            self.iterations = list(resume.stats.iterations)
+            first_depth = resume.depth + 1
+            if self.iterations:
+                guess = sign * self.iterations[-1]['score']
+        for depth in range(first_depth, self.max_depth + 1):
+            self.depth = depth
+            self.abortable = depth > 1
+            try:
+                score, move = self.aspiration_search(board, moves, depth, color, guess)
+            except SearchTimeout:
+                break
+            guess = score
+            best_move = move
+            # The previous best move leads the next iteration, and its principal
+            # variation is followed first further down the tree
+            moves.remove(move)
+            moves.insert(0, move)
+            self.pv = self.principal_variation(board, color, depth)
+            self.pv_moves = self._pv_keys(board, color, self.pv)
+
+            elapsed = time.perf_counter() - start
+            self.iterations.append({'depth': depth, 'score': sign * score, 'nodes': self.nodes, 'time': elapsed,
+                                    'cutoffs': self.orderer.cutoffs,
+                                    'first_move_cutoff_rate': self.orderer.first_move_cutoff_rate()})
+            # A new iteration takes several times longer than the last one, so
+            # don't start one that is unlikely to finish
+            if self.time_budget and elapsed > self.time_budget / 2:
+                break
+            if self.node_budget and self.nodes >= self.node_budget:
+                break
+        return best_move
+
+    def aspiration_search(self, board, moves, depth, color, guess):
+        # Search the root in a narrow window around guess, the last iteration's
+        # score. A score outside the window only bounds the true one, so the
+        # side that failed is widened, ASPIRATION_GROWTH times at each fail and
+        # left open once past ASPIRATION_LIMIT, and the root searched again.
+        # Widths are in men, as the evaluators score them, so every difficulty
+        # fails about as often.
+        if guess is None or (self.workers and self.workers > 1):
+            return self.search_root(board, moves, depth, color)
+        man = MAN_VALUES[self.difficulty]
+        delta = self.ASPIRATION_WINDOW * man
+        limit = self.ASPIRATION_LIMIT * man
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            score, move = self.search_root(board, moves, depth, color, alpha, beta)
+            if alpha < score < beta:
+                return score, move
+            self.aspiration_researches += 1
+            delta *= self.ASPIRATION_GROWTH
+            if score <= alpha:
+                alpha = score - delta if delta <= limit else float('-inf')
+            else:
+                beta = score + delta if delta <= limit else float('inf')
+
+    def search_root(self, board, moves, depth, color, alpha=float('-inf'), beta=float('inf')):
+        # Score and best move for color, the side to move, searched as negamax
+        # does an inner node. The score is exact only inside (alpha, beta).
+        key = position_key(board.hash, color)
+        if self.workers and self.workers > 1:
+            if self.parallel is None:
+                from parallel import ParallelRootSearch
+                self.parallel = ParallelRootSearch(self.workers)
+            score, move = self.parallel.search_root(self, board, moves, depth, color)
+            self.tt.store(key, depth, score, EXACT, move)
+            return score, move
+
+        opponent = RED if color == WHITE else WHITE
+        alpha_orig = alpha
+        best_score = float('-inf')
+        best_move = None
+        for index, move in enumerate(moves):
+            record = board.apply_move(*move)
+            try:
+                score = self.search_move(board, depth - 1, alpha, beta, opponent, 1, index > 0)
+            finally:
+                board.undo_move(record)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        flag = UPPER if best_score <= alpha_orig else LOWER if best_score >= beta else EXACT
+        self.tt.store(key, depth, best_score, flag, best_move)
+        return best_score, best_move
+
+    def probe_tablebase(self, board, color):
+        """Exact score from the endgame tables with color to move, or None if they don't cover board"""
+        if self.tablebase is None or not self.tablebase.covers(board.red_left + board.white_left):
+            return None
+        result = self.tablebase.probe(Position.from_board(board, color))
+        if result is None:
+            return None
+        outcome, distance = result
+        if outcome == DRAWN:
+            return 0
+        score = TABLEBASE_WIN - distance
+        if outcome == LOSS:
+            score = -score
+        return score if color == WHITE else -score
+
+    def tablebase_root(self, board, moves, color):
+        # (score, move) for the fastest win, or slowest loss, when the tables
+        # cover every move; None otherwise
+        if self.tablebase is None or not self.tablebase.covers(board.red_left + board.white_left):
+            return None
+        opponent = RED if color == WHITE else WHITE
+        best_score, best_move = None, None
+        for move in moves:
+            record = board.apply_move(*move)
+            try:
+                winner = board.winner()
+                if winner:
+                    score = TABLEBASE_WIN if winner == WHITE else -TABLEBASE_WIN
+                else:
+                    score = self.probe_tablebase(board, opponent)
+            finally:
+                board.undo_move(record)
+            if score is None:
+                return None
+            if best_score is None or (score > best_score if color == WHITE else score < best_score):
+                best_score, best_move = score, move
+        return best_score, best_move
+
+    def _check_budget(self):
+        self.next_check = self.nodes + self.CHECK_INTERVAL
+        if self.cancel is not None and self.cancel.is_set():
+            raise SearchTimeout()
+        if not self.abortable:
+            return
+        if self.node_budget and self.nodes >= self.node_budget:
+            raise SearchTimeout()
+        if self.deadline and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def principal_variation(self, board, color, depth):
+        # Follow the best moves stored in the transposition table from board
+        pv = []
+        records = []
+        for _ in range(depth):
+            entry = self.tt.probe(position_key(board.hash, color))
+            if not entry or entry[3] not in self.get_successors(board, color):
+                break
+            pv.append(entry[3])
+            records.append(board.apply_move(*entry[3]))
+            color = RED if color == WHITE else WHITE
+        for record in reversed(records):
+            board.undo_move(record)
+        return pv
+
+    def _pv_keys(self, board, color, pv):
+        # Map the position key at each PV node to its PV move
+        pv_moves = {}
+        records = []
+        for move in pv:
+            pv_moves[position_key(board.hash, color)] = move
+            records.append(board.apply_move(*move))
+            color = RED if color == WHITE else WHITE
+        for record in reversed(records):
+            board.undo_move(record)
+        return pv_moves
+
+    def search_move(self, board, depth, alpha, beta, color, ply, scout):
+        # Score, for the side that just moved, of the position after its move,
+        # with color to reply. With scout, a null window first asks only whether
+        # the move beats alpha; most moves don't, and that answer is much
+        # cheaper than their score. One that does is searched again in full.
+        if scout and beta - alpha > self.SCOUT_WIDTH:
+            score = -self.negamax(board, depth, -alpha - self.SCOUT_WIDTH, -alpha, color, ply)
+            if not alpha < score < beta:
+                return score
+            self.pvs_researches += 1
+        return -self.negamax(board, depth, -beta, -alpha, color, ply)
+
+    def negamax(self, board, depth, alpha, beta, color, ply=0):
+        # Principal variation search: alpha-beta over scores from the point of
+        # view of color, the side to move, where a move's score is the negation
+        # of the reply's. The first move, the most likely best after ordering,
+        # gets the full window and the rest are scouted by search_move.
+        self.nodes += 1
+        if ply > self.max_ply:
+            self.max_ply = ply
+        if self.nodes >= self.next_check:
+            self._check_budget()
+
+        key = position_key(board.hash, color)
+        alpha_orig, beta_orig = alpha, beta
+        hash_move = None
+        entry = self.tt.probe(key)
+        if entry:
+            entry_depth, entry_score, flag, hash_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if beta <= alpha:
+                    return entry_score
+
+        sign = 1 if color == WHITE else -1
+        score = self.probe_tablebase(board, color)
+        if score is not None:
+            score *= sign
+            self.tt.store(key, self.MAX_DEPTH, score, EXACT, None)
+            return score
+
+        if board.winner():
+            self.leaf_evals += 1
+            score = sign * self.evaluate(board)
+            self.tt.store(key, self.MAX_DEPTH, score, EXACT, None)
+            return score
+
+        if depth == 0:
+            if not self.quiescence:
+                self.leaf_evals += 1
+                score = sign * self.evaluate(board)
+                self.tt.store(key, 0, score, EXACT, None)
+                return score
+            score = self.quiescence_search(board, alpha, beta, color, ply)
+            # The capture search cuts off against the window, so its score may be a bound
+            flag = UPPER if score <= alpha else LOWER if score >= beta else EXACT
+            self.tt.store(key, 0, score, flag, None)
+            return score
+
+        if depth == 1 and self.batch_eval:
+            # Smaller frontiers are faster scored one child at a time, below
+            from batch_eval import BATCH_DIFFICULTIES, BATCH_CROSSOVER
+            if self.difficulty in BATCH_DIFFICULTIES and len(self.get_successors(board, color)) >= BATCH_CROSSOVER:
+                return self.evaluate_frontier(board, color, key, ply)
+
+        hash_move = self.pv_moves.get(key, hash_move)
+        moves = self.orderer.order(board, self.get_successors(board, color), ply, hash_move)
+
+        # Successors are searched in place: apply the move, recurse, then take it back
+        opponent = RED if color == WHITE else WHITE
+        best_score = float('-inf')
+        best_move = None
+        for index, move in enumerate(moves):
+            record = board.apply_move(*move)
+            try:
+                score = self.search_move(board, depth - 1, alpha, beta, opponent, ply + 1, index > 0)
+            finally:
+                board.undo_move(record)  # Also runs when the budget aborts the search
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                self.orderer.record_cutoff(move, ply, depth, index)
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    def quiescence_search(self, board, alpha, beta, color, ply):
+        # Past the nominal depth, play out forced captures before evaluating, so
+        # a leaf is never scored halfway through an exchange. Captures are
+        # compulsory, so the side to move can only stand pat, taking the static
+        # evaluation, when it has none; otherwise every capture is searched.
+        # Each capture removes material, so the lines always end. Scores are
+        # for color, as in negamax. Exchanges often leave few enough pieces
+        # for the endgame tables, which know better than the evaluation.
+        self.nodes += 1
+        self.qnodes += 1
+        if ply > self.max_ply:
+            self.max_ply = ply
+        if self.nodes >= self.next_check:
+            self._check_budget()
+
+        score = self.probe_tablebase(board, color)
+        if score is not None:
+            return score if color == WHITE else -score
+
+        moves = self.get_successors(board, color)
+        if not moves or not moves[0][4] or board.winner():
+            self.leaf_evals += 1
+            score = self.evaluate(board)
+            return score if color == WHITE else -score
+
+        # Longest chains first; they tend to win the most material
+        moves.sort(key=lambda move: len(move[4]), reverse=True)
+        opponent = RED if color == WHITE else WHITE
+        best_score = float('-inf')
+        for move in moves:
+            record = board.apply_move(*move)
+            try:
+                score = -self.quiescence_search(board, -beta, -alpha, opponent, ply + 1)
+            finally:
+                board.undo_move(record)
+            best_score = max(best_score, score)
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                break
+        return best_score
+
+    def evaluate_frontier(self, board, color, key, ply):
+        # All children of a frontier node are leaves: encode them all and score
+        # them in one NumPy call instead of one evaluate() per child. Every child
+        # is scored, so the result is exact whatever the window. As negamax
+        # would at depth 0, a child the endgame tables cover takes their score,
+        # and one where a capture is due is resolved by quiescence_search.
+        from batch_eval import encode, evaluate_batch
+        moves = self.get_successors(board, color)
+        opponent = RED if color == WHITE else WHITE
+        sign = 1 if color == WHITE else -1
+        encoded = []
+        resolved = {}  # Move index -> score of the children not left to the batch
+        for index, move in enumerate(moves):
+            record = board.apply_move(*move)
+            try:
+                score = self.probe_tablebase(board, opponent)
+                replies = self.get_successors(board, opponent) if self.quiescence and score is None else None
+                if score is not None:
+                    self.nodes += 1
+                    resolved[index] = sign * score
+                elif replies and replies[0][4]:
+                    resolved[index] = -self.quiescence_search(board, float('-inf'), float('inf'),
+                                                              opponent, ply + 1)
+                else:
+                    encoded.append(encode(board))
+            finally:
+                board.undo_move(record)
+        self.nodes += len(encoded)
+        self.leaf_evals += len(encoded)
+
+        # The batch scores are from WHITE's point of view, like evaluate()
+        scores = [sign * float(score) for score in evaluate_batch(encoded, self.difficulty)] if encoded else []
+        for index in sorted(resolved):
+            scores.insert(index, resolved[index])
+        index = max(range(len(moves)), key=scores.__getitem__)
+        score = scores[index]
+        self.tt.store(key, 1, score, EXACT, moves[index])
+        return score
+
+    def get_successors(self, board, color):
+        # Moves as (start_row, start_col, end_row, end_col, captures), ready for Board.apply_move.
+        # Callers reorder the list, so each gets its own copy of the cached moves.
+        key = position_key(board.hash, color)
+        moves = self.move_cache.get(key)
+        if moves is None:
+            moves = tuple(board.legal_moves(color))
+            self.move_cache[key] = moves
+            if len(self.move_cache) > self.MOVE_CACHE_SIZE:
+                self.move_cache.popitem(last=False)
+        else:
+            self.move_cache.move_to_end(key)
+        return list(moves)
+
+    # HEURISTIC EVALUATION FUNCTION WITH DIFFICULTY LEVELS
+    def evaluate(self, board):
+        if self.difficulty == 'easy':
+            return self.evaluate_simple(board)
+        elif self.difficulty == 'medium':
+            return self.evaluate_strategic(board)
+        elif self.difficulty == 'hard':
+            return self.evaluate_defensive(board)
+        elif self.difficulty == 'very_hard':
+            return self.evaluate_comprehensive(board)
+
+    def evaluate_simple(self, board):
+        score = (board.white_left - board.red_left) + (board.white_kings * 1.5 - board.red_kings * 1.5)
+        return score
+
+    def evaluate_strategic(self, board):
+        # When the opponent has any jump to make, every piece of the side is
+        # scored: its position and mobility, and the penalty for being at risk.
+        # Mobility counts a piece's moves as get_valid_moves does, its capture
+        # chains if it has any and its free steps otherwise. The attack map
+        # counts the steps, so only the pieces with a jump are followed.
+        score = 0
+        attacks = AttackMap(board)
+        for color, opponent, sign in ((WHITE, RED, 1), (RED, WHITE, -1)):
+            if not attacks.capturers[opponent]:
+                continue
+            moves = attacks.steps[color]
+            for sq in iter_bits(attacks.capturers[color]):
+                row, col = square_coords(sq)
+                ends = {(end_row, end_col) for end_row, end_col, _, _
+                        in board.capture_chains(board.get_piece(row, col), row, col)}
+                moves += len(ends)
+            position_value = 0
+            count = 0
+            for sq in iter_bits(attacks.pieces[color]):
+                position_value += STRATEGIC_POSITION_VALUES[sq]
+                count += 1
+            # Central pieces are slightly more valuable. The penalty for risky
+            # positions has always taken 3 off the score for each piece, red's too.
+            score += sign * (position_value + moves * 0.1) - 3 * count
+        return score
+
+    def evaluate_defensive(self, board):
+        # Every term is a piece-square value, kept up to date by the board as pieces move
+        return board.pst_scores[DEFENSIVE]
+
+    def evaluate_comprehensive(self, board):
+        # Material and position come from the board's piece-square totals; only the
+        # vulnerability and protection terms depend on the surrounding pieces.
+        # The vulnerability penalty goes to pieces with a jump of their own to
+        # make, as it always has here and in batch_eval.
+        score = board.pst_scores[COMPREHENSIVE]
+        attacks = AttackMap(board)
+        for color, sign in ((WHITE, 1), (RED, -1)):
+            protected = bin(attacks.protected[color]).count('1')
+            vulnerable = bin(attacks.capturers[color]).count('1')
+            score += sign * (3 * protected - 3 * vulnerable)
+        return score
@@ -0,0 +1,84 @@
+from constants import ROWS, COLS, WHITE, RED
+
+# Piece-square tables for the static parts of the evaluators. Everything in
+# evaluate_defensive, and the material and position terms of
+# evaluate_comprehensive, depends only on a piece's colour, king flag and
+# square. Board adds and subtracts these values as pieces move, so a leaf
+# reads the totals instead of rescanning the board.
+
+# Indices into Board.pst_scores
+DEFENSIVE, COMPREHENSIVE = 0, 1
+
+
+def defensive_value(color, king, row, col):
+    # Basic piece value
+    base_value = 1 if not king else 1.5
+
+    # Edge protection value
+    edge_value = 0.1 if col == 0 or col == COLS - 1 else 0
+
+    # Back row protection
+    back_row_value = 0.2 if (color == WHITE and row == 0) or (color == RED and row == ROWS - 1) else 0
+
+    # Center control (more central pieces are given a slight bonus)
+    center_value = 1 - abs(3.5 - col) * 0.05  # Decreases as you move away from the center
+
+    # Set trap value
+    trap_value = 0.5 if color == WHITE and row == 0 and (col == 0 or col == COLS - 1) else 0
+
+    # Incentivize moving closer to becoming a king
+    kinging_advantage = 0.3 if (color == WHITE and row < 3) or (color == RED and row > 4) else 0
+
+    # Penalize allowing the opponent to king
+    opponent_kinging_risk = -0.5 if (color == WHITE and row > 5) or (color == RED and row < 2) else 0
+
+    return (base_value + edge_value + back_row_value + center_value + trap_value + kinging_advantage +
+            opponent_kinging_risk)
+
+
+def comprehensive_value(color, king, row, col):
+    # Define base values
+    base_value = 5 if not king else 7.75
+
+    # Back row defense value
+    back_row_value = 4 if (color == WHITE and row == 7) or (color == RED and row == 0) else 0
+
+    # Middle control values
+    middle_box_value = 2.5 if (2 <= row <= 5) and (2 <= col <= 5) else 0
+    middle_row_value = 0.5 if (2 <= row <= 5) and not (2 <= col <= 5) else 0
+
+    return base_value + back_row_value + middle_box_value + middle_row_value
+
+
+def _build_tables():
+    # PIECE_SQUARE[(color, king)][row][col] is a tuple of signed values, one per
+    # evaluator: positive for WHITE pieces, negative for RED ones
+    tables = {}
+    for color in (WHITE, RED):
+        sign = 1 if color == WHITE else -1
+        for king in (False, True):
+            tables[(color, king)] = [
+                [(sign * defensive_value(color, king, row, col), sign * comprehensive_value(color, king, row, col))
+                 for col in range(COLS)]
+                for row in range(ROWS)]
+    return tables
+
+
+PIECE_SQUARE = _build_tables()
+
+
+def piece_square(piece, row, col):
+    return PIECE_SQUARE[(piece.color, piece.king)][row][col]
+
+
+def score_board(board):
+    """Compute the piece-square totals from scratch"""
+    defensive = comprehensive = 0.0
+    for row in range(ROWS):
+        for col in range(COLS):
+            piece = board.get_piece(row, col)
+            if piece:
+                values = piece_square(piece, row, col)
+                defensive += values[DEFENSIVE]
+                comprehensive += values[COMPREHENSIVE]
+    return [defensive, comprehensive]
@@ -1,7 +1,9 @@
+import os
 import tkinter as tk
 from tkinter import messagebox, Toplevel, scrolledtext
-from constants import WIDTH, HEIGHT, SQUARE_SIZE
+from constants import WIDTH, HEIGHT, SQUARE_SIZE, TABLEBASE, BOOK, GAMES
 from game import Game
+from pdn import PdnWriter
 
 
 def display_rules():
@@ -47,8 +49,23 @@ def main():
                            command=lambda: set_difficulty(difficulty_var.get()))
         b.pack()
 
-    game = Game(canvas, difficulty=difficulty_var.get())
-    game.board.load_images()
+    # Endgame tables and the opening book are optional; build them with
+    # `python tablebase.py build` and `python book.py selfplay`
+    tablebase = TABLEBASE if os.path.exists(TABLEBASE) else None
+    book = BOOK if os.path.exists(BOOK) else None
+
+    # The AI thinks in the background and reports its progress here
+    status_var = tk.StringVar()
+    tk.Label(root, textvariable=status_var).pack()
+
+    game = Game(canvas, difficulty=difficulty_var.get(), status=status_var.set, ponder=True,
+                tablebase=tablebase, book=book)
+    game.view.load_images()
+
+    # Let the AI think on the human's time
+    ponder_var = tk.BooleanVar(value=game.ponder)
+    tk.Checkbutton(root, text="Ponder", variable=ponder_var,
+                   command=lambda: setattr(game, 'ponder', ponder_var.get())).pack()
 
     reset_button = tk.Button(root, text="Reset Game", command=game.reset)
     reset_button.pack(side=tk.LEFT, padx=10, pady=10)
@@ -56,8 +73,23 @@ def main():
     rules_button = tk.Button(root, text="Show Rules", command=display_rules)
     rules_button.pack(side=tk.RIGHT, padx=10, pady=10)
 
+    def save_game():
+        writer = PdnWriter(GAMES)
+        writer.write(game.record())
+        writer.close()
+        status_var.set(f"Game saved to {GAMES}")
+
+    save_button = tk.Button(root, text="Save Game", command=save_game)
+    save_button.pack(side=tk.RIGHT, padx=10, pady=10)
+
     canvas.bind("<Button-1>", lambda event: mouse_click(event, game))
 
+    def quit_game():
+        game.close()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", quit_game)
+
     def set_difficulty(diff):
         game.difficulty = diff
         game.reset()
@@ -0,0 +1,77 @@
+from constants import ROWS
+
+# Sort keys, highest first: hash/PV move, then captures (longer chains first)
+# and promotions, then killer moves, then the history heuristic
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+PROMOTION_SCORE = 1 << 23
+KILLER_SCORE = 1 << 22
+
+
+class MoveOrderer:
+    """Orders moves so alpha-beta meets the likely best move first
+
+    Killer moves are quiet moves that caused a cutoff at the same ply in a
+    sibling subtree. The history table rewards quiet moves by the depth of
+    the cutoffs they caused anywhere in the tree.
+    """
+
+    KILLER_SLOTS = 2
+
+    def __init__(self, max_ply=128):
+        self.max_ply = max_ply
+        self.killers = [[None] * self.KILLER_SLOTS for _ in range(max_ply)]
+        self.history = {}
+
+        # Cutoff statistics: how many cutoffs happened and at which move index
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoffs_by_index = {}
+
+    def new_search(self):
+        self.killers = [[None] * self.KILLER_SLOTS for _ in range(self.max_ply)]
+        # Keep the history of earlier moves, but let recent searches dominate
+        for move in self.history:
+            self.history[move] //= 2
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoffs_by_index = {}
+
+    def score(self, board, move, ply, hash_move):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        start_row, start_col, end_row, end_col, captures = move
+        score = 0
+        if captures:
+            score += CAPTURE_SCORE + len(captures)
+        piece = board.get_piece(start_row, start_col)
+        if end_row in (0, ROWS - 1) and piece and not piece.king:
+            score += PROMOTION_SCORE
+        if score:
+            return score
+        if ply < self.max_ply and move in self.killers[ply]:
+            return KILLER_SCORE - self.killers[ply].index(move)
+        return self.history.get(move[:4], 0)
+
+    def order(self, board, moves, ply, hash_move=None):
+        """Return moves sorted best-first; ties keep generation order"""
+        return sorted(moves, key=lambda move: self.score(board, move, ply, hash_move), reverse=True)
+
+    def record_cutoff(self, move, ply, depth, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        self.cutoffs_by_index[index] = self.cutoffs_by_index.get(index, 0) + 1
+
+        # Captures are already ordered first; only quiet moves become killers
+        if move[4]:
+            return
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers.pop()
+                killers.insert(0, move)
+        self.history[move[:4]] = self.history.get(move[:4], 0) + depth * depth
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
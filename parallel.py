@@ -0,0 +1,154 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from bitboard import Position
+from constants import RED, WHITE
+
+# Parallel root search. Root moves are split across a process pool in
+# young-brothers-wait fashion: the first (PV) move is searched alone to get a
+# real bound, then the remaining moves are searched concurrently. Workers share
+# the best root score found so far, so each one starts with the tightest bound
+# available and scouts its move against it with a null window, as the engine's
+# principal variation search does. Scores are for the side to move at the
+# root. Positions travel to the workers as bitboard Positions, which pickle as
+# four small values, and the workers run a headless Engine. Cancelling the
+# engine's search sets a shared event that the workers' budget checks see.
+
+_engine = None
+_best = None
+_cancel = None
+
+
+def _init_worker(best, cancel):
+    global _best, _cancel
+    _best = best
+    _cancel = cancel
+
+
+def _worker_engine(difficulty, tt_size_mb, tablebase, quiescence):
+    # Each worker keeps its own Engine, and with it its transposition table and
+    # move-ordering history, for as long as the pool lives. Tablebase files are
+    # mapped by every worker and shared through the page cache.
+    global _engine
+    from engine import Engine
+    path = _engine.tablebase.path if _engine and _engine.tablebase else None
+    if _engine is None or _engine.tt.size_mb != tt_size_mb or path != tablebase:
+        if _engine is not None:
+            _engine.close()
+        _engine = Engine(difficulty, tt_size_mb=tt_size_mb, time_budget=None, tablebase=tablebase)
+    elif _engine.difficulty != difficulty:
+        _engine.difficulty = difficulty
+        _engine.reset()
+    _engine.quiescence = quiescence
+    return _engine
+
+
+def _search_root_move(position, move, depth, difficulty, tt_size_mb, tablebase, quiescence, remaining, node_budget):
+    """Search one root move in a worker
+
+    Returns (score, bound, nodes, qnodes, leaf_evals, max_ply, pvs_researches), or None if
+    out of budget.
+    """
+    from engine import SearchTimeout
+
+    engine = _worker_engine(difficulty, tt_size_mb, tablebase, quiescence)
+    board = position.to_board()
+    engine.nodes = engine.qnodes = engine.leaf_evals = engine.max_ply = engine.pvs_researches = 0
+    engine.next_check = engine.CHECK_INTERVAL
+    engine.abortable = remaining is not None or node_budget is not None
+    engine.deadline = time.perf_counter() + remaining if remaining is not None else None
+    engine.node_budget = node_budget
+    engine.cancel = _cancel
+    engine.pv_moves = {}
+
+    opponent = RED if position.turn == WHITE else WHITE
+    bound = _best.value
+    board.apply_move(*move)
+    try:
+        # The eldest move has no bound to scout against
+        score = engine.search_move(board, depth - 1, bound, float('inf'), opponent, 1, bound > float('-inf'))
+    except SearchTimeout:
+        return None
+
+    with _best.get_lock():
+        if score > _best.value:
+            _best.value = score
+    return score, bound, engine.nodes, engine.qnodes, engine.leaf_evals, engine.max_ply, engine.pvs_researches
+
+
+class ParallelRootSearch:
+    POLL_SECONDS = 0.05  # How often a wait for a worker checks whether the search was cancelled
+
+    def __init__(self, workers):
+        self.workers = workers
+        # Spawned workers start from a clean interpreter and never touch Tk
+        context = multiprocessing.get_context('spawn')
+        self.best = context.Value('d', 0.0)
+        self.cancel = context.Event()
+        self.pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                        initargs=(self.best, self.cancel))
+
+    def search_root(self, engine, board, moves, depth, color):
+        from engine import SearchTimeout
+
+        position = Position.from_board(board, color)
+        self.best.value = float('-inf')
+        self.cancel.clear()  # Every task of an earlier search has finished
+        remaining = node_budget = None
+        if engine.abortable:
+            if engine.deadline:
+                remaining = engine.deadline - time.perf_counter()
+            if engine.node_budget:
+                node_budget = engine.node_budget - engine.nodes
+
+        tablebase = engine.tablebase.path if engine.tablebase else None
+
+        def submit(move):
+            return self.pool.submit(_search_root_move, position, move, depth, engine.difficulty,
+                                    engine.tt.size_mb, tablebase, engine.quiescence, remaining, node_budget)
+
+        def result(future):
+            # The future's result, or None once the engine's search is cancelled
+            while not wait([future], timeout=self.POLL_SECONDS).done:
+                if engine.cancel is not None and engine.cancel.is_set():
+                    return None
+            return future.result()
+
+        # Young brothers wait: the eldest move sets the bound for the others
+        futures = [submit(moves[0])]
+        results = [result(futures[0])]
+        if results[0] is not None:
+            futures += [submit(move) for move in moves[1:]]
+            for future in futures[1:]:
+                results.append(result(future))
+                if results[-1] is None:
+                    break
+        if None in results:
+            # Out of budget or cancelled: stop the workers still searching and
+            # drop the moves not started, so the pool is free for the next search
+            self.cancel.set()
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise SearchTimeout()
+
+        best_score, best_move = None, None
+        for move, (score, bound, nodes, qnodes, leaf_evals, max_ply, pvs_researches) in zip(moves, results):
+            engine.nodes += nodes
+            engine.qnodes += qnodes
+            engine.leaf_evals += leaf_evals
+            engine.max_ply = max(engine.max_ply, max_ply)
+            engine.pvs_researches += pvs_researches
+            # A score that did not beat the bound it was searched with is only an
+            # upper bound on the move's value
+            if score <= bound:
+                continue
+            if best_score is None or score > best_score:
+                best_score, best_move = score, move
+        return best_score, best_move
+
+    def close(self):
+        self.cancel.set()
+        self.pool.shutdown(cancel_futures=True)
+
@@ -0,0 +1,221 @@
+import argparse
+import re
+import sys
+import time
+
+from bitboard import Position, square_index, square_coords, pdn_square, from_pdn_square
+from constants import WHITE, RED
+
+# PDN (Portable Draughts Notation) game records.
+#
+# A game is a block of [Name "Value"] tags followed by its moves, e.g.
+# "1. 11-15 23-19 2. 8-11 22x15", and a result. Squares are numbered as in
+# bitboard.pdn_square: red, which moves first, is PDN's black and starts on
+# squares 1-12. A capture lists its landing squares, "15x24x31", or just its
+# ends, "15x31". Results give white's score first, as in PGN.
+#
+# The reader is a generator that holds one game at a time, so it streams
+# files of any size. A game it can't read is still yielded, with its error,
+# and reading carries on with the next game. The writer only ever appends.
+
+RESULT_CODES = {WHITE: '1-0', RED: '0-1', 'draw': '1/2-1/2'}
+RESULTS = {'1-0', '0-1', '1/2-1/2', '2-0', '0-2', '1-1', '0-0', '*'}
+
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN = re.compile(r'[{}();]|[^\s{}();]+')
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+MOVE = re.compile(r'\d+(?:[-x]\d+)+')
+LINE_WIDTH = 79
+
+
+class PdnError(ValueError):
+    pass
+
+
+def move_text(squares, capture):
+    """PDN for a move through squares, a list of (row, col) from start to end"""
+    return ('x' if capture else '-').join(str(pdn_square(square_index(row, col))) for row, col in squares)
+
+
+def board_move_text(board, move):
+    """PDN for an engine move tuple (start_row, start_col, end_row, end_col, captures), before it is made"""
+    start_row, start_col, end_row, end_col, captures = move
+    piece = board.get_piece(start_row, start_col)
+    details = board.get_valid_moves(piece, start_row, start_col)[(end_row, end_col)]
+    return move_text([(start_row, start_col), *details['landing_positions'], (end_row, end_col)], bool(captures))
+
+
+def parse_move(board, color, text):
+    """The engine move tuple that text names, checked against the legal moves of color on board"""
+    try:
+        squares = [square_coords(from_pdn_square(int(number))) for number in re.split('[-x]', text)]
+    except ValueError as error:
+        raise PdnError(f"bad move {text!r}: {error}") from error
+    start, end = squares[0], squares[-1]
+    details = board.get_all_valid_moves(color).get(start, {}).get(end)
+    # Chains are keyed by their landing square, so the board knows one route per move
+    if (details is None or bool(details['captures']) != ('x' in text)
+            or len(squares) > 2 and squares[1:-1] != list(details['landing_positions'])):
+        raise PdnError(f"illegal move {text} for {color}")
+    return (*start, *end, tuple(details['captures']))
+
+
+class PdnGame:
+    """One game record: its tags, its moves in PDN and its result
+
+    error says why the reader gave up on the game's moves, or is None.
+    """
+
+    def __init__(self, tags=None, moves=None, result='*', error=None):
+        self.tags = dict(tags or {})
+        self.moves = list(moves or [])
+        self.result = result
+        self.error = error
+
+    def start(self):
+        """A Board for the starting position, from the FEN tag if there is one, and the side to move"""
+        if self.error:
+            raise PdnError(self.error)
+        position = Position.from_fen(self.tags['FEN']) if 'FEN' in self.tags else Position()
+        return position.to_board(), position.turn
+
+    def replay(self):
+        """Play the moves through Board's rules, yielding (board, color, move) before each
+        is made; board is the same object throughout"""
+        board, color = self.start()
+        for text in self.moves:
+            move = parse_move(board, color, text)
+            yield board, color, move
+            board.apply_move(*move)
+            color = RED if color == WHITE else WHITE
+
+    def final_board(self):
+        board, color = self.start()
+        for text in self.moves:
+            board.apply_move(*parse_move(board, color, text))
+            color = RED if color == WHITE else WHITE
+        return board, color
+
+    def __repr__(self):
+        return (f"PdnGame({self.tags.get('Black', '?')} vs {self.tags.get('White', '?')}, "
+                f"{len(self.moves)} moves, {self.result})")
+
+
+def read_games(source):
+    """Yield the games in source, a path or an open text file, one at a time"""
+    if isinstance(source, str):
+        with open(source) as f:
+            yield from _read_games(f)
+    else:
+        yield from _read_games(source)
+
+
+def _read_games(lines):
+    tags, moves = {}, []
+    error = None  # Set, the rest of the game's moves are skipped
+    in_comment = False
+    variation_depth = 0  # Variations, in parentheses, are skipped
+    for line_number, line in enumerate(lines, 1):
+        if not in_comment and not variation_depth and line.lstrip().startswith('['):
+            if moves or error:
+                # A tag after moves starts the next game, even without a result
+                yield PdnGame(tags, moves, tags.get('Result', '*'), error)
+                tags, moves, error = {}, [], None
+            for name, value in TAG.findall(line):
+                tags[name] = re.sub(r'\\(.)', r'\1', value)
+            continue
+        for token in TOKEN.findall(line):
+            if in_comment:
+                in_comment = token != '}'
+            elif token == '{':
+                in_comment = True
+            elif token == ';':
+                break  # Comment to the end of the line
+            elif token == '(':
+                variation_depth += 1
+            elif token == ')':
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth:
+                continue
+            elif token in RESULTS:
+                yield PdnGame(tags, moves, token, error)
+                tags, moves, error = {}, [], None
+            elif error:
+                continue
+            else:
+                # Move numbers may be glued to the move, and annotations to its end
+                token = MOVE_NUMBER.sub('', token).rstrip('!?')
+                if not token or token.startswith('$'):
+                    continue
+                if not MOVE.fullmatch(token):
+                    error = f"line {line_number}: unexpected {token!r}"
+                    continue
+                moves.append(token)
+    if tags or moves or error:
+        yield PdnGame(tags, moves, tags.get('Result', '*'), error)
+
+
+class PdnWriter:
+    """Appends games to a PDN file, given as a path or an open text file"""
+
+    def __init__(self, target):
+        self.owns_file = isinstance(target, str)
+        self.file = open(target, 'a') if self.owns_file else target
+
+    def write(self, game):
+        lines = []
+        for name, value in {**game.tags, 'Result': game.result}.items():
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'[{name} "{value}"]')
+        lines.append('')
+
+        turn = Position.from_fen(game.tags['FEN']).turn if 'FEN' in game.tags else RED
+        tokens = []
+        for ply, text in enumerate(game.moves, 0 if turn == RED else 1):
+            # Move numbers stay on the line of their move
+            if ply % 2 == 0:
+                text = f"{ply // 2 + 1}. {text}"
+            elif not tokens:
+                text = f"1... {text}"
+            tokens.append(text)
+        tokens.append(game.result)
+        line = ''
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > LINE_WIDTH:
+                lines.append(line)
+                line = token
+            else:
+                line = f"{line} {token}" if line else token
+        lines.append(line)
+
+        self.file.write('\n'.join(lines) + '\n\n')
+        self.file.flush()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check PDN game records by replaying them")
+    parser.add_argument('files', nargs='*', help="PDN files (default: standard input)")
+    args = parser.parse_args()
+
+    games = plies = errors = 0
+    start = time.perf_counter()
+    for source in args.files or [sys.stdin]:
+        for game in read_games(source):
+            games += 1
+            try:
+                for _ in game.replay():
+                    plies += 1
+            except ValueError as error:
+                errors += 1
+                print(f"game {games} {game!r}: {error}", file=sys.stderr)
+    print(f"{games} games, {plies} moves replayed, {errors} with errors in {time.perf_counter() - start:.1f}s")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import sys
+import time
+
+from bitboard import Position, square_index
+from constants import COLS, WHITE, RED
+
+# Perft: count the leaf nodes of the move tree to a fixed depth. The counts
+# depend only on the move generator, so they catch any change in the rules it
+# produces, and the time taken measures the generator's speed. Both
+# generators are covered: Board (get_all_valid_moves, which the game and the
+# engine use) and the bitboard Position.
+#
+# The reference counts below follow this game's rules: captures are forced,
+# a capture chain is taken in full, a man that captures a king is crowned and
+# a man is crowned on the far row.
+
+
+def diagram(rows, turn):
+    """A Position from eight lines drawn like Position's repr: w/W white man/king, r/R red, . empty"""
+    white = red = kings = 0
+    for row, line in enumerate(rows):
+        for col in range(COLS):
+            if (row + col) % 2 == 0 or line[col] == '.':
+                continue
+            bit = 1 << square_index(row, col)
+            if line[col] in 'wW':
+                white |= bit
+            else:
+                red |= bit
+            if line[col] in 'WR':
+                kings |= bit
+    return Position(white, red, kings, turn)
+
+
+POSITIONS = {
+    'start': (Position(), {1: 7, 2: 49, 3: 302, 4: 1469, 5: 7361, 6: 36768}),
+    # A red king with capture chains that branch several ways
+    'multi-jump': (diagram([
+        ' . . . .',
+        '. w w . ',
+        ' . . . .',
+        '. w w . ',
+        ' . R . .',
+        '. w . . ',
+        ' . . . r',
+        'r . . . ',
+    ], RED), {1: 3, 2: 16, 3: 62, 4: 265, 5: 1009, 6: 4467, 7: 17475}),
+    # Red men that capture white kings, once mid-chain, and are crowned for it
+    'regicide': (diagram([
+        ' . . . .',
+        '. . w . ',
+        ' . . . .',
+        '. W . W ',
+        ' . r . r',
+        '. . . . ',
+        ' r . . .',
+        '. . . . ',
+    ], RED), {1: 2, 2: 6, 3: 32, 4: 123, 5: 562, 6: 2549, 7: 12591}),
+    # Captures that land on the crowning row, where a man's chain stops because
+    # men only jump forward, and a white man a step from crowning
+    'promotion': (diagram([
+        ' . . . .',
+        '. w . w ',
+        ' r . r .',
+        '. . . . ',
+        ' . w . .',
+        '. . . . ',
+        ' w . . .',
+        '. . . r ',
+    ], RED), {1: 2, 2: 2, 3: 7, 4: 35, 5: 145, 6: 677, 7: 2875}),
+    # Kings only, white to move
+    'kings': (diagram([
+        ' . W . .',
+        '. . . . ',
+        ' . . R .',
+        '. W . . ',
+        ' . . . .',
+        '. . R . ',
+        ' . . . .',
+        'R . . W ',
+    ], WHITE), {1: 8, 2: 48, 3: 314, 4: 2366, 5: 15558, 6: 112510}),
+}
+
+
+def perft_board(board, color, depth):
+    if depth == 0:
+        return 1
+    opponent = RED if color == WHITE else WHITE
+    nodes = 0
+    for (start_row, start_col), moves in board.get_all_valid_moves(color).items():
+        for (end_row, end_col), details in moves.items():
+            if depth == 1:
+                nodes += 1
+                continue
+            record = board.apply_move(start_row, start_col, end_row, end_col, tuple(details.get('captures', ())))
+            nodes += perft_board(board, opponent, depth - 1)
+            board.undo_move(record)
+    return nodes
+
+
+def perft_bitboard(position, depth):
+    if depth == 0:
+        return 1
+    moves = position.moves()
+    if depth == 1:
+        return len(moves)
+    return sum(perft_bitboard(position.play(move), depth - 1) for move in moves)
+
+
+def perft(position, depth, generator):
+    if generator == 'board':
+        return perft_board(position.to_board(), position.turn, depth)
+    return perft_bitboard(position, depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move-tree leaves and check them against reference values")
+    parser.add_argument('--depth', type=int, default=None,
+                        help="deepest depth to run (default: every depth with a reference count)")
+    parser.add_argument('--generator', choices=['board', 'bitboard', 'both'], default='both')
+    parser.add_argument('--position', dest='positions', action='append', choices=list(POSITIONS),
+                        help="positions to run (default: all)")
+    args = parser.parse_args()
+
+    generators = ['board', 'bitboard'] if args.generator == 'both' else [args.generator]
+    failures = 0
+    print(f"{'position':<12} {'generator':<9} {'depth':>5} {'nodes':>10} {'seconds':>8} {'nodes/s':>9}  check")
+    for name in args.positions or POSITIONS:
+        position, references = POSITIONS[name]
+        depths = range(1, (args.depth or max(references)) + 1)
+        for generator in generators:
+            for depth in depths:
+                start = time.perf_counter()
+                nodes = perft(position, depth, generator)
+                elapsed = time.perf_counter() - start
+                expected = references.get(depth)
+                if expected is None:
+                    check = '-'
+                elif nodes == expected:
+                    check = 'ok'
+                else:
+                    check = f"FAIL (expected {expected})"
+                    failures += 1
+                print(f"{name:<12} {generator:<9} {depth:>5} {nodes:>10} {elapsed:>8.3f} "
+                      f"{nodes / elapsed if elapsed else 0:>9.0f}  {check}")
+    if failures:
+        print(f"{failures} counts differ from the reference values")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
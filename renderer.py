@@ -0,0 +1,102 @@
+from constants import ROWS, COLS, BLACK, GREY, SQUARE_SIZE, CROWN
+
+
+class BoardView:
+    """Draws a Board on a Tk canvas
+
+    Everything that only matters on screen lives here rather than on the
+    pieces: the crown image, the selected piece and the pieces with a move.
+
+    The canvas items are made once and then updated in place: each dark
+    square has a piece oval, a ring for "this piece can move" and a crown,
+    which a draw recolors, shows or hides only where the square changed.
+    Valid-move markers come from pools that grow to the most ever shown at
+    once and are moved into place, so the canvas never accumulates items.
+    """
+    PADDING = 15
+    MARKER_RADIUS = 10  # Where a move ends
+    LANDING_RADIUS = 8  # Where a capture chain lands on its way
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.crown_image = None
+        self.items = None  # (row, col) -> (piece, ring, crown) item ids, made on the first draw
+        self.shown = {}  # (row, col) -> (color, king, highlighted, movable) its items show, None if empty
+        self.markers = []
+        self.landings = []
+
+    def load_images(self):
+        # Imported here so the model and the search engine run without a display
+        import tkinter as tk
+        try:
+            self.crown_image = tk.PhotoImage(file=CROWN).subsample(64, 64)
+            print("Crown image loaded successfully.")
+        except Exception as e:
+            print(f"Failed to load crown image: {e}")
+            return
+        if self.items:
+            for _, _, crown in self.items.values():
+                self.canvas.itemconfigure(crown, image=self.crown_image)
+            self.shown = {}  # Kings already drawn get their crown on the next draw
+
+    @staticmethod
+    def center(row, col):
+        return SQUARE_SIZE * col + SQUARE_SIZE // 2, SQUARE_SIZE * row + SQUARE_SIZE // 2
+
+    def _create_items(self):
+        self.canvas.config(bg=GREY)
+        radius = SQUARE_SIZE // 2 - self.PADDING
+        self.items = {}
+        for row in range(ROWS):
+            for col in range((row + 1) % 2, COLS, 2):
+                x0 = col * SQUARE_SIZE
+                y0 = row * SQUARE_SIZE
+                self.canvas.create_rectangle(x0, y0, x0 + SQUARE_SIZE, y0 + SQUARE_SIZE, fill=BLACK, outline="")
+                x, y = self.center(row, col)
+                piece = self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                                state='hidden')
+                ring = self.canvas.create_oval(x - radius - 5, y - radius - 5, x + radius + 5, y + radius + 5,
+                                               outline='green', width=2, state='hidden')
+                crown = self.canvas.create_image(x, y, image=self.crown_image, state='hidden')
+                self.items[(row, col)] = (piece, ring, crown)
+
+    def draw(self, board, selected=None, movable=()):
+        """Bring the canvas up to date with board; selected is the (row, col)
+        of the selected piece and movable the squares of the pieces that
+        have a move"""
+        if self.items is None:
+            self._create_items()
+        for position, (piece_item, ring, crown) in self.items.items():
+            piece = board.get_piece(*position)
+            state = None if piece is None else (piece.color, piece.king, position == selected, position in movable)
+            if self.shown.get(position) == state:
+                continue
+            self.shown[position] = state
+            if state is None:
+                for item in (piece_item, ring, crown):
+                    self.canvas.itemconfigure(item, state='hidden')
+                continue
+            color, king, highlighted, can_move = state
+            self.canvas.itemconfigure(piece_item, state='normal', fill=color,
+                                      outline='yellow' if highlighted else '', width=4 if highlighted else 0)
+            self.canvas.itemconfigure(ring, state='normal' if can_move else 'hidden')
+            self.canvas.itemconfigure(crown, state='normal' if king and self.crown_image else 'hidden')
+
+    def draw_valid_moves(self, valid_moves):
+        """Mark where the selected piece can move, and where its capture chains land on the way"""
+        ends = list(valid_moves)
+        landings = [position for move_info in valid_moves.values()
+                    for position in move_info.get('landing_positions', [])]
+        self._place(self.markers, ends, self.MARKER_RADIUS, outline='green', fill='green', width=1.5)
+        self._place(self.landings, landings, self.LANDING_RADIUS, outline='blue', fill='', width=2)
+
+    def _place(self, pool, positions, radius, **style):
+        while len(pool) < len(positions):
+            pool.append(self.canvas.create_oval(0, 0, 0, 0, state='hidden', **style))
+        for i, item in enumerate(pool):
+            if i < len(positions):
+                x, y = self.center(*positions[i])
+                self.canvas.coords(item, x - radius, y - radius, x + radius, y + radius)
+                self.canvas.itemconfigure(item, state='normal')
+            else:
+                self.canvas.itemconfigure(item, state='hidden')
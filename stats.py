@@ -0,0 +1,137 @@
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+from collections import Counter
+
+# Search instrumentation: the per-move statistics object, a JSON lines sink
+# for it, and the profilers that can wrap a move's search.
+
+
+class SearchStats:
+    """What one move's search did"""
+
+    __slots__ = ('source', 'nodes', 'qnodes', 'leaf_evals', 'max_ply', 'pvs_researches', 'aspiration_researches',
+                 'cutoffs', 'first_move_cutoffs', 'cutoffs_by_index', 'tt_probes', 'tt_hits',
+                 'tablebase_probes', 'tablebase_hits', 'time', 'nps', 'iterations')
+
+    def __init__(self, source, nodes, qnodes, leaf_evals, max_ply, pvs_researches, aspiration_researches,
+                 cutoffs, first_move_cutoffs, cutoffs_by_index, tt_probes, tt_hits, tablebase_probes,
+                 tablebase_hits, time, iterations):
+        self.source = source  # 'search', 'forced', 'book', 'tablebase' or 'ponder'
+        self.nodes = nodes
+        self.qnodes = qnodes  # The part of nodes spent resolving captures past the nominal depth
+        self.leaf_evals = leaf_evals  # Calls to the evaluation function, batched leaves included
+        self.max_ply = max_ply  # Deepest ply any line reached
+        self.pvs_researches = pvs_researches  # Null-window scouts that failed high and were searched again
+        self.aspiration_researches = aspiration_researches  # Root windows that failed and were widened
+        self.cutoffs = cutoffs
+        self.first_move_cutoffs = first_move_cutoffs
+        self.cutoffs_by_index = cutoffs_by_index  # Move index -> cutoffs it caused
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+        self.tablebase_probes = tablebase_probes
+        self.tablebase_hits = tablebase_hits
+        self.time = time
+        self.nps = nodes / time if time > 0 else 0.0
+        # One dict per completed iteration: depth, score, nodes and time so far, cutoffs
+        self.iterations = iterations
+
+    def to_dict(self):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        # JSON object keys are strings
+        fields['cutoffs_by_index'] = {str(index): count for index, count in sorted(self.cutoffs_by_index.items())}
+        return fields
+
+    def __repr__(self):
+        return (f"SearchStats(source={self.source}, nodes={self.nodes}, qnodes={self.qnodes}, "
+                f"leaf_evals={self.leaf_evals}, max_ply={self.max_ply}, time={self.time:.3f})")
+
+
+class JsonLinesSink:
+    """Appends one JSON object per line to a path or an open text file"""
+
+    def __init__(self, target):
+        self.owns_file = isinstance(target, str)
+        self.file = open(target, 'a') if self.owns_file else target
+        self.lock = threading.Lock()  # The GUI searches on worker threads
+
+    def write(self, record):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts the stacks
+
+    The output is in the collapsed-stack format flame graph tools read: one
+    line per distinct stack, frames from the outermost in, then the count.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _sample(self, target):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+PROFILERS = ('cprofile', 'sample')
+_profile_numbers = itertools.count(1)
+
+
+def profile_call(kind, directory, function, *args):
+    """Call function under a profiler and write the profile to a new file in directory
+
+    kind is 'cprofile', for a pstats file, or 'sample', for collapsed stacks.
+    """
+    if kind not in PROFILERS:
+        raise ValueError(f"unknown profiler {kind!r}, expected one of {PROFILERS}")
+    name = os.path.join(directory, f"search-{os.getpid()}-{next(_profile_numbers)}")
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args)
+        path = name + '.prof'
+        profiler.dump_stats(path)
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            result = function(*args)
+        finally:
+            profiler.stop()
+        path = name + '.folded'
+        profiler.dump(path)
+    print(f"Search profile written to {path}", file=sys.stderr)
+    return result
@@ -0,0 +1,372 @@
+import argparse
+import itertools
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+from bitboard import Position, SQUARES, FULL, STEPS, JUMPS, KING_DIRS, WHITE_DIRS, RED_DIRS, PROMOTION_MASK, iter_bits
+from constants import WHITE, RED
+
+# Endgame tablebases built by retrograde analysis.
+#
+# Positions are grouped by material signature (white men, white kings, red
+# men, red kings). Within a signature every placement of the four piece
+# groups gets an index from the combinatorial number system, times two for
+# the side to move, so a lookup is a single array access. Each entry is a
+# little-endian uint16 holding the result for the side to move:
+#
+#   0          no such position (overlapping pieces, men on their crowning row)
+#   1          draw
+#   2 + 2 * d  win in d plies
+#   3 + 2 * d  loss in d plies
+#
+# A file starts with a header listing the signatures and the offset of each
+# table. Probes go through mmap, so nothing is read into memory up front and
+# processes probing the same file share it through the page cache.
+
+MAGIC = b'CKTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')  # magic, version, max pieces, signature count
+SIGNATURE = struct.Struct('<4BQQ')  # wm, wk, rm, rk, offset, entries
+
+UNKNOWN, DRAW = 0, 1
+WIN, LOSS, DRAWN = 'win', 'loss', 'draw'
+
+BINOMIAL = [[0] * (SQUARES + 1) for _ in range(SQUARES + 1)]
+for _n in range(SQUARES + 1):
+    BINOMIAL[_n][0] = 1
+    for _k in range(1, _n + 1):
+        BINOMIAL[_n][_k] = BINOMIAL[_n - 1][_k - 1] + BINOMIAL[_n - 1][_k]
+
+WHITE_CROWN_ROW = 0xF << 28  # White men never stand on row 7
+RED_CROWN_ROW = 0xF  # Red men never stand on row 0
+
+
+def win(distance):
+    return 2 + 2 * distance
+
+
+def loss(distance):
+    return 3 + 2 * distance
+
+
+def decode(value):
+    """(result, distance) for a stored value, or None for an unknown position"""
+    if value == UNKNOWN:
+        return None
+    if value == DRAW:
+        return DRAWN, 0
+    return (WIN if value % 2 == 0 else LOSS), (value - 2) // 2
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def signature(position):
+    kings = position.kings
+    return (popcount(position.white & ~kings), popcount(position.white & kings),
+            popcount(position.red & ~kings), popcount(position.red & kings))
+
+
+def table_size(sig):
+    size = 2
+    for count in sig:
+        size *= BINOMIAL[SQUARES][count]
+    return size
+
+
+def index(position, sig):
+    """Offset of position in the table for sig"""
+    kings = position.kings
+    groups = (position.white & ~kings, position.white & kings, position.red & ~kings, position.red & kings)
+    idx = 0
+    for bits, count in zip(groups, sig):
+        idx *= BINOMIAL[SQUARES][count]
+        # Colex rank of the group's squares among all sets of the same size
+        i = 1
+        while bits:
+            low = bits & -bits
+            idx += BINOMIAL[low.bit_length() - 1][i]
+            bits ^= low
+            i += 1
+    return idx * 2 + (position.turn == WHITE)
+
+
+def signatures(max_pieces):
+    """Every signature with both sides on the board, in dependency order
+
+    Captures lead to fewer pieces and promotions turn a man into a king, so
+    tables are built by total pieces, then by number of men.
+    """
+    sigs = []
+    for total in range(2, max_pieces + 1):
+        for sig in itertools.product(range(total + 1), repeat=4):
+            if sum(sig) == total and sig[0] + sig[1] and sig[2] + sig[3]:
+                sigs.append(sig)
+    return sorted(sigs, key=lambda sig: (sum(sig), sig[0] + sig[2], sig))
+
+
+def positions(sig):
+    """Every legal placement for sig, with either side to move"""
+    wm, wk, rm, rk = sig
+    for white_men in itertools.combinations(range(SQUARES), wm):
+        wm_bits = sum(1 << sq for sq in white_men)
+        if wm_bits & WHITE_CROWN_ROW:
+            continue
+        for red_men in itertools.combinations(range(SQUARES), rm):
+            rm_bits = sum(1 << sq for sq in red_men)
+            if rm_bits & (RED_CROWN_ROW | wm_bits):
+                continue
+            for white_kings in itertools.combinations(range(SQUARES), wk):
+                wk_bits = sum(1 << sq for sq in white_kings)
+                if wk_bits & (wm_bits | rm_bits):
+                    continue
+                for red_kings in itertools.combinations(range(SQUARES), rk):
+                    rk_bits = sum(1 << sq for sq in red_kings)
+                    if rk_bits & (wm_bits | rm_bits | wk_bits):
+                        continue
+                    for turn in (WHITE, RED):
+                        yield Position(wm_bits | wk_bits, rm_bits | rk_bits, wk_bits | rk_bits, turn)
+
+
+# With a handful of pieces on the board, walking the pieces through the step
+# and jump tables is cheaper than the whole-board shifts Position uses.
+
+def _sparse_sides(position, color):
+    if color == WHITE:
+        return position.white, position.red, WHITE_DIRS
+    return position.red, position.white, RED_DIRS
+
+
+def _has_capture(position, color):
+    own, opp, man_dirs = _sparse_sides(position, color)
+    empty = ~(position.white | position.red) & FULL
+    for sq in iter_bits(own):
+        for d in (KING_DIRS if position.kings >> sq & 1 else man_dirs):
+            jump = JUMPS[sq][d]
+            if jump and opp >> jump[0] & 1 and empty >> jump[1] & 1:
+                return True
+    return False
+
+
+def _has_moves(position, color):
+    own, _, man_dirs = _sparse_sides(position, color)
+    empty = ~(position.white | position.red) & FULL
+    for sq in iter_bits(own):
+        for d in (KING_DIRS if position.kings >> sq & 1 else man_dirs):
+            step = STEPS[sq][d]
+            if step >= 0 and empty >> step & 1:
+                return True
+    return _has_capture(position, color)
+
+
+def _winner(position):
+    # Position.winner for sparse boards
+    if not position.red:
+        return WHITE
+    if not position.white:
+        return RED
+    if not _has_moves(position, RED):
+        return WHITE
+    if not _has_moves(position, WHITE):
+        return RED
+    return None
+
+
+def _leaves_signature(position, move):
+    # Captures and promotions change the material; plain moves stay in the table
+    src, dst, captures, _ = move
+    return bool(captures) or (not position.kings >> src & 1 and (1 << dst) & PROMOTION_MASK)
+
+
+def unmoves(position):
+    """Positions where the side that just moved made a plain move into position"""
+    mover = RED if position.turn == WHITE else WHITE
+    own = position.white if mover == WHITE else position.red
+    empty = ~(position.white | position.red) & FULL
+    man_dirs = WHITE_DIRS if mover == WHITE else RED_DIRS
+    for dst in iter_bits(own):
+        king = position.kings >> dst & 1
+        if not king and (1 << dst) & PROMOTION_MASK:
+            continue  # Men never step onto their own back row, and stepping onto the far one crowns them
+        for d in (KING_DIRS if king else man_dirs):
+            # The piece came from one step back along direction d
+            src = STEPS[dst][3 - d]
+            if src < 0 or not empty >> src & 1:
+                continue
+            move = (1 << src) | (1 << dst)
+            white, red = position.white, position.red
+            if mover == WHITE:
+                white ^= move
+            else:
+                red ^= move
+            kings = position.kings ^ move if king else position.kings
+            previous = Position(white, red, kings, mover)
+            # Captures are forced, so a plain move was only legal without one
+            if not _has_capture(previous, mover):
+                yield previous
+
+
+class TablebaseBuilder:
+    def __init__(self, max_pieces=4, log=print):
+        self.max_pieces = max_pieces
+        self.tables = {}
+        self.log = log
+
+    def lookup(self, position):
+        sig = signature(position)
+        if not (sig[0] + sig[1] and sig[2] + sig[3]):
+            # The last capture cleared one side off the board
+            return win(0) if position.winner() == position.turn else loss(0)
+        return self.tables[sig][index(position, sig)]
+
+    def build(self):
+        for sig in signatures(self.max_pieces):
+            start = time.perf_counter()
+            self.tables[sig] = self.build_signature(sig)
+            values = self.tables[sig]
+            known = sum(1 for value in values if value)
+            wins = sum(1 for value in values if value >= 2 and value % 2 == 0)
+            self.log(f"{sig}: {known} positions, {wins} wins, {time.perf_counter() - start:.1f}s")
+        return self.tables
+
+    def build_signature(self, sig):
+        values = array('H', bytes(2 * table_size(sig)))
+        remaining = {}  # Unresolved positions -> moves not yet known to lose for the mover
+        buckets = [[]]  # buckets[d]: (position, successor_lost) for successors resolved at distance d
+        terminal = []
+
+        def schedule(distance, entry):
+            while len(buckets) <= distance:
+                buckets.append([])
+            buckets[distance].append(entry)
+
+        for position in positions(sig):
+            idx = index(position, sig)
+            winner = _winner(position)
+            if winner:
+                values[idx] = win(0) if winner == position.turn else loss(0)
+                terminal.append(position)
+                continue
+            moves = position.moves()
+            remaining[idx] = len(moves)
+            for move in moves:
+                if not _leaves_signature(position, move):
+                    continue
+                result = decode(self.lookup(position.play(move)))
+                if result[0] != DRAWN:
+                    schedule(result[1], (position, result[0] == LOSS))
+
+        def resolve(position, value, distance):
+            idx = index(position, sig)
+            values[idx] = value
+            del remaining[idx]
+            for previous in unmoves(position):
+                schedule(distance, (previous, value % 2 == 1))
+
+        for position in terminal:
+            for previous in unmoves(position):
+                schedule(0, (previous, values[index(position, sig)] % 2 == 1))
+
+        # Resolve in order of distance so wins are as short and losses as long as possible
+        distance = 0
+        while distance < len(buckets):
+            for position, successor_lost in buckets[distance]:
+                idx = index(position, sig)
+                if idx not in remaining:
+                    continue
+                if successor_lost:
+                    resolve(position, win(distance + 1), distance + 1)
+                else:
+                    remaining[idx] -= 1
+                    if remaining[idx] == 0:
+                        resolve(position, loss(distance + 1), distance + 1)
+            buckets[distance] = None
+            distance += 1
+
+        # Whatever is left can avoid losing forever
+        for idx in remaining:
+            values[idx] = DRAW
+        return values
+
+    def write(self, path):
+        sigs = list(self.tables)
+        offset = HEADER.size + SIGNATURE.size * len(sigs)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.max_pieces, len(sigs)))
+            for sig in sigs:
+                entries = len(self.tables[sig])
+                f.write(SIGNATURE.pack(*sig, offset, entries))
+                offset += 2 * entries
+            for sig in sigs:
+                values = self.tables[sig]
+                if sys.byteorder != 'little':
+                    values = array('H', values)
+                    values.byteswap()
+                values.tofile(f)
+
+
+class Tablebase:
+    """Read-only, memory-mapped tablebase file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        self.offsets = {}
+        for i in range(count):
+            *sig, offset, entries = SIGNATURE.unpack_from(self.data, HEADER.size + i * SIGNATURE.size)
+            self.offsets[tuple(sig)] = offset
+        self.probes = self.hits = 0
+
+    def covers(self, piece_count):
+        return piece_count <= self.max_pieces
+
+    def probe(self, position):
+        """(result, distance) for the side to move, or None if the position is not in the tables"""
+        self.probes += 1
+        offset = self.offsets.get(signature(position))
+        if offset is None:
+            return None
+        value, = struct.unpack_from('<H', self.data, offset + 2 * index(position, signature(position)))
+        result = decode(value)
+        if result:
+            self.hits += 1
+        return result
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build checkers endgame tablebases")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="generate tables by retrograde analysis")
+    build.add_argument('--pieces', type=int, default=4, help="largest total number of pieces")
+    build.add_argument('--output', default='endgames.tb')
+    info = commands.add_parser('info', help="list the tables in a file")
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        builder = TablebaseBuilder(args.pieces)
+        builder.build()
+        builder.write(args.output)
+        print(f"Wrote {args.output}")
+    else:
+        tablebase = Tablebase(args.path)
+        print(f"{args.path}: up to {tablebase.max_pieces} pieces, {len(tablebase.offsets)} tables")
+        for sig, offset in tablebase.offsets.items():
+            print(f"  wm={sig[0]} wk={sig[1]} rm={sig[2]} rk={sig[3]} at offset {offset}")
+        tablebase.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitboard import Position, square_coords
+from constants import RED, WHITE
+from engine import Engine, DIFFICULTIES
+from pdn import PdnGame, PdnWriter, RESULT_CODES, move_text, board_move_text
+
+# Engine-vs-engine tournaments. Every pair of configurations plays the same
+# random openings once with each colour, games run in worker processes, and
+# each result is appended to a JSON lines file as soon as the game finishes.
+#
+# An engine configuration is written as difficulty[:option=value,...], e.g.
+# "hard", "very_hard:depth=6" or "easy:time=0.2,name=fast". Options are
+# time (seconds per move), nodes (per move), depth, tt (MB), tb (tablebase
+# file), book (opening book file), qs (quiescence search, on or off) and name.
+
+OPTIONS = {'time': ('time_budget', float), 'nodes': ('node_budget', int), 'depth': ('max_depth', int),
+           'tt': ('tt_size_mb', int), 'tb': ('tablebase', str),
+           'book': ('book', str), 'qs': ('quiescence', lambda value: value.lower() not in ('0', 'no', 'off'))}
+
+
+def parse_engine(spec):
+    difficulty, _, rest = spec.partition(':')
+    if difficulty not in DIFFICULTIES:
+        raise argparse.ArgumentTypeError(f"unknown difficulty {difficulty!r}, expected one of {DIFFICULTIES}")
+    config = {'name': spec, 'difficulty': difficulty, 'options': {}}
+    for item in filter(None, rest.split(',')):
+        key, _, value = item.partition('=')
+        if key == 'name':
+            config['name'] = value
+        elif key in OPTIONS:
+            option, convert = OPTIONS[key]
+            config['options'][option] = convert(value)
+        else:
+            raise argparse.ArgumentTypeError(f"unknown engine option {key!r} in {spec!r}")
+    return config
+
+
+def random_opening(rng, plies):
+    """Play plies random legal moves from the start position"""
+    position = Position()
+    moves = []
+    for _ in range(plies):
+        legal = position.moves()
+        if not legal or position.winner():
+            break
+        move = rng.choice(legal)
+        moves.append(move)
+        position = position.play(move)
+    return position, moves
+
+
+def play_game(task):
+    """Play one game in a worker process and return its result record"""
+    rng = random.Random(task['seed'])
+    position, opening = random_opening(rng, task['opening_plies'])
+    board = position.to_board()
+    color = position.turn
+    moves = [move_text([square_coords(sq) for sq in (src, *landings, dst)], bool(captures))
+             for src, dst, captures, landings in opening]
+    players = {WHITE: task['white'], RED: task['red']}
+    engines = {side: Engine(config['difficulty'], **config['options']) for side, config in players.items()}
+    clocks = {WHITE: task['game_time'], RED: task['game_time']}
+    move_caps = {side: engine.time_budget for side, engine in engines.items()}
+    stats = {side: {'moves': 0, 'nodes': 0, 'time': 0.0} for side in players}
+
+    seen = {}
+    quiet_plies = 0
+    result, reason = None, None
+    plies = len(opening)
+    while result is None:
+        winner = board.winner()
+        if winner:
+            result, reason = winner, 'no pieces or moves'
+            break
+        if plies >= task['max_plies']:
+            result, reason = 'draw', 'move limit'
+            break
+        key = (board.hash, color)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= 3:
+            result, reason = 'draw', 'repetition'
+            break
+        if quiet_plies >= task['quiet_plies']:
+            result, reason = 'draw', 'no progress'
+            break
+
+        engine = engines[color]
+        if clocks[color] is not None:
+            # Spread the remaining clock over the expected rest of the game
+            budget = clocks[color] / 20 + task['increment']
+            if move_caps[color]:
+                budget = min(budget, move_caps[color])
+            engine.time_budget = budget
+
+        started = time.perf_counter()
+        search = engine.search(board, color)
+        elapsed = time.perf_counter() - started
+        stats[color]['moves'] += 1
+        stats[color]['nodes'] += search.stats.nodes
+        stats[color]['time'] += elapsed
+        if clocks[color] is not None:
+            clocks[color] -= elapsed
+            if clocks[color] < 0:
+                result, reason = RED if color == WHITE else WHITE, 'time forfeit'
+                break
+            clocks[color] += task['increment']
+
+        start_row, start_col = search.move[:2]
+        moving_piece = board.get_piece(start_row, start_col)
+        # A capture, or a man moving forward, can't be undone, so it resets the no-progress count
+        quiet_plies = 0 if search.move[4] or not moving_piece.king else quiet_plies + 1
+        moves.append(board_move_text(board, search.move))
+        board.apply_move(*search.move)
+        color = RED if color == WHITE else WHITE
+        plies += 1
+
+    for engine in engines.values():
+        engine.close()
+    return {
+        'game': task['game'],
+        'white': task['white']['name'],
+        'red': task['red']['name'],
+        'result': result,
+        'reason': reason,
+        'plies': plies,
+        'opening': [square_coords(move[0]) + square_coords(move[1]) for move in opening],
+        'moves': moves,  # The whole game in PDN, opening included
+        'stats': {side: stats[side] for side in (WHITE, RED)},
+    }
+
+
+def make_tasks(configs, args):
+    rng = random.Random(args.seed)
+    tasks = []
+    pairs = list(itertools.combinations(configs, 2))
+    for _ in range(args.games):
+        seed = rng.getrandbits(32)
+        for first, second in pairs:
+            # Both colour assignments share the opening, so it favours neither engine
+            for white, red in ((first, second), (second, first)):
+                tasks.append({
+                    'game': len(tasks), 'seed': seed, 'white': white, 'red': red,
+                    'opening_plies': args.opening_plies, 'max_plies': args.max_plies,
+                    'quiet_plies': args.quiet_plies, 'game_time': args.game_time, 'increment': args.increment,
+                })
+    return tasks
+
+
+def elo(score, games):
+    """Elo difference for a score fraction, with its 95% confidence half-width"""
+    if games == 0:
+        return 0.0, float('inf')
+    clamp = 0.5 / games  # Keep perfect and zero scores finite
+    p = min(max(score, clamp), 1 - clamp)
+    diff = -400 * math.log10(1 / p - 1)
+    margin = 1.96 * math.sqrt(p * (1 - p) / games)
+    low = min(max(p - margin, clamp), 1 - clamp)
+    high = min(max(p + margin, clamp), 1 - clamp)
+    return diff, (-400 * math.log10(1 / high - 1) + 400 * math.log10(1 / low - 1)) / 2
+
+
+def summarize(records, configs):
+    table = {config['name']: {'wins': 0, 'draws': 0, 'losses': 0, 'moves': 0, 'nodes': 0, 'time': 0.0}
+             for config in configs}
+    for record in records:
+        for side in (WHITE, RED):
+            row = table[record[side]]
+            if record['result'] == 'draw':
+                row['draws'] += 1
+            elif record['result'] == side:
+                row['wins'] += 1
+            else:
+                row['losses'] += 1
+            row['moves'] += record['stats'][side]['moves']
+            row['nodes'] += record['stats'][side]['nodes']
+            row['time'] += record['stats'][side]['time']
+
+    print(f"{'engine':<24} {'W':>5} {'D':>5} {'L':>5} {'score':>6} {'Elo':>14} {'nodes/s':>9} {'s/move':>7}")
+    for name, row in table.items():
+        games = row['wins'] + row['draws'] + row['losses']
+        score = (row['wins'] + row['draws'] / 2) / games if games else 0.0
+        diff, margin = elo(score, games)
+        nps = row['nodes'] / row['time'] if row['time'] else 0.0
+        per_move = row['time'] / row['moves'] if row['moves'] else 0.0
+        print(f"{name:<24} {row['wins']:>5} {row['draws']:>5} {row['losses']:>5} {score:>6.1%} "
+              f"{diff:>+7.0f} ±{margin:<5.0f} {nps:>9.0f} {per_move:>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine tournaments")
+    parser.add_argument('--engine', dest='engines', type=parse_engine, action='append', required=True,
+                        help="difficulty[:option=value,...]; give at least two")
+    parser.add_argument('--games', type=int, default=10, help="openings per pairing; each is played with both colours")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', default='tournament.jsonl', help="JSON lines file results are appended to")
+    parser.add_argument('--pdn', default=None, help="PDN file the games are appended to")
+    parser.add_argument('--opening-plies', type=int, default=4, help="random plies played before the engines take over")
+    parser.add_argument('--game-time', type=float, default=None, help="seconds on each side's clock")
+    parser.add_argument('--increment', type=float, default=0.0, help="seconds added to the clock after each move")
+    parser.add_argument('--max-plies', type=int, default=200, help="adjudicate a draw after this many plies")
+    parser.add_argument('--quiet-plies', type=int, default=50,
+                        help="adjudicate a draw after this many king moves without a capture")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if len(args.engines) < 2:
+        parser.error("a tournament needs at least two --engine configurations")
+    names = [config['name'] for config in args.engines]
+    if len(set(names)) != len(names):
+        parser.error("engine configurations need distinct names; add name=... to tell them apart")
+
+    tasks = make_tasks(args.engines, args)
+    records = []
+    games = PdnWriter(args.pdn) if args.pdn else None
+    with open(args.output, 'a') as output, ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(play_game, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            records.append(record)
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            if games:
+                tags = {'Event': "Tournament", 'Round': record['game'] + 1,
+                        'Black': record['red'], 'White': record['white']}
+                games.write(PdnGame(tags, record['moves'], RESULT_CODES[record['result']]))
+            print(f"[{done}/{len(tasks)}] {record['white']} (white) vs {record['red']} (red): "
+                  f"{record['result']} ({record['reason']}, {record['plies']} plies)", file=sys.stderr)
+
+    if games:
+        games.close()
+    summarize(records, args.engines)
+
+
+if __name__ == '__main__':
+    main()
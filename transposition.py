@@ -0,0 +1,57 @@
+# Bound types for stored scores
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist position key
+
+    Every bucket holds two entries. The depth-preferred slot keeps the result
+    searched deepest and is only overwritten by an equal or deeper search, or
+    once its entry is from an older search, even when the new result is
+    for the same position. Everything else goes to the always-replace slot,
+    so recent results are never lost entirely.
+    """
+
+    # Rough cost of one stored entry (tuple, key, score and the list slot)
+    ENTRY_BYTES = 160
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+        self.clear()
+
+    def clear(self):
+        self.deep = [None] * self.buckets
+        self.recent = [None] * self.buckets
+
+    def new_search(self):
+        # Entries from earlier searches stay usable but lose their depth priority
+        self.generation += 1
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """Return (depth, score, flag, move) for key, or None"""
+        self.probes += 1
+        index = key % self.buckets
+        entry = self.deep[index]
+        if entry is None or entry[0] != key:
+            entry = self.recent[index]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry[1:5]
+
+    def store(self, key, depth, score, flag, move):
+        self.stores += 1
+        index = key % self.buckets
+        entry = (key, depth, score, flag, move, self.generation)
+        deep = self.deep[index]
+        if deep is None or depth >= deep[1] or deep[5] != self.generation:
+            self.deep[index] = entry
+        else:
+            self.recent[index] = entry
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.deep) + sum(entry is not None for entry in self.recent)
@@ -0,0 +1,35 @@
+import random
+from constants import ROWS, COLS, WHITE, RED
+
+# Zobrist keys: one random 64-bit number per (colour, king, square). A position's
+# hash is the XOR of the keys of its pieces, so moves update it incrementally.
+# The generator is seeded so hashes are stable across processes and runs, which
+# lets worker processes and on-disk tables share them.
+_rng = random.Random(0x5EED_C4EC)
+
+PIECE_KEYS = {
+    (color, king): [[_rng.getrandbits(64) for _ in range(COLS)] for _ in range(ROWS)]
+    for color in (WHITE, RED) for king in (False, True)
+}
+
+# Board hashes leave out the side to move; it is mixed in by position_key
+WHITE_TO_MOVE = _rng.getrandbits(64)
+
+
+def piece_key(piece, row, col):
+    return PIECE_KEYS[(piece.color, piece.king)][row][col]
+
+
+def hash_board(board):
+    """Compute a board's hash from scratch"""
+    h = 0
+    for row in range(ROWS):
+        for col in range(COLS):
+            piece = board.get_piece(row, col)
+            if piece:
+                h ^= piece_key(piece, row, col)
+    return h
+
+
+def position_key(board_hash, color):
+    return board_hash ^ WHITE_TO_MOVE if color == WHITE else board_hash